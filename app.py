@@ -1,41 +1,38 @@
+import time
+_SCRIPT_STARTED = time.perf_counter()
 import sys
 import subprocess
 import threading
-import time
 import os
+import signal
 import json
-import streamlit.components.v1 as components
+import importlib
 from datetime import datetime, timedelta
 import urllib.parse
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import requests
 import sqlite3
+import queue
+import gzip
+import csv
+import hashlib
+import socket
+import random
+import re
+import shlex
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import pandas as pd
-import plotly.express as px
 import base64
-try:
-    import plotly.express as px
-except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "plotly"])
-    import plotly.express as px
-# Install required packages
-try:
-    import streamlit as st
-except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "streamlit"])
-    import streamlit as st
-
-try:
-    import google.auth
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import Flow
-except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "google-auth", "google-auth-oauthlib", "google-api-python-client"])
-    import google.auth
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import Flow
+import streamlit as st
+
+def import_optional(module_name, package):
+    """Import a dependency on first use; fails with an install hint instead of installing at runtime"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise RuntimeError(f"{package} is not installed; run `pip install -r requirements.txt` ({e})") from e
 
 # Predefined OAuth configuration
 PREDEFINED_OAUTH_CONFIG = {
@@ -284,13 +281,149 @@ def add_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# Encoding settings used when none are configured
+DEFAULT_VIDEO_SETTINGS = {
+    "resolution": "1080p",
+    "bitrate": "2500k",
+    "fps": "30",
+    "codec": "libx264",
+    "audio_bitrate": "128k",
+    "audio_codec": "aac"
+}
+
+# Database location and background log writer tuning
+LOG_DB_PATH = "streaming_logs.db"
+LOG_QUEUE_MAXSIZE = 10000
+LOG_FLUSH_ROWS = 200
+LOG_FLUSH_INTERVAL_MS = 500
+
+# How often parsed ffmpeg progress is persisted to stream_metrics
+METRICS_SAMPLE_SECONDS = 5
+
+# Retention for log data; FFMPEG lines are high-volume and only useful for a short while
+LOG_RETENTION_HOURS = {
+    "FFMPEG": int(os.environ.get("LOG_RETENTION_FFMPEG_HOURS", 24)),
+}
+LOG_RETENTION_DEFAULT_HOURS = int(os.environ.get("LOG_RETENTION_DAYS", 90)) * 24
+METRICS_RETENTION_HOURS = int(os.environ.get("METRICS_RETENTION_DAYS", 7)) * 24
+RESTARTS_RETENTION_HOURS = int(os.environ.get("RESTARTS_RETENTION_DAYS", 30)) * 24
+LOG_PRUNE_INTERVAL_SECONDS = 3600
+LOG_PRUNE_CHUNK_ROWS = 5000
+LOG_VACUUM_PAGES = 2000
+
+class LogWriter:
+    """Background writer that batches SQLite inserts over one long-lived connection"""
+
+    _FLUSH = object()
+
+    def __init__(self, db_path=LOG_DB_PATH, max_queue=LOG_QUEUE_MAXSIZE,
+                 flush_rows=LOG_FLUSH_ROWS, flush_interval_ms=LOG_FLUSH_INTERVAL_MS):
+        self.db_path = db_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params):
+        """Queue a statement without ever blocking the caller; returns False if dropped"""
+        try:
+            self.queue.put_nowait((sql, params))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been committed"""
+        done = threading.Event()
+        try:
+            self.queue.put((self._FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self):
+        """Snapshot of writer counters for the UI"""
+        with self._lock:
+            return {
+                'queued': self.queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'last_error': self.last_error
+            }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write(self, conn, pending):
+        # Group consecutive rows sharing a statement so ordering is preserved
+        groups = []
+        for sql, params in pending:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        try:
+            for sql, rows in groups:
+                conn.executemany(sql, rows)
+            conn.commit()
+            with self._lock:
+                self.written += len(pending)
+        except Exception as e:
+            conn.rollback()
+            with self._lock:
+                self.errors += 1
+                self.last_error = str(e)
+
+    def _run(self):
+        conn = self._connect()
+        pending = []
+        waiters = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                if item[0] is self._FLUSH:
+                    waiters.append(item[1])
+                else:
+                    pending.append(item)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if waiters or len(pending) >= self.flush_rows or now >= deadline:
+                if pending:
+                    self._write(conn, pending)
+                    pending = []
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+                deadline = now + self.flush_interval
+
+@st.cache_resource
+def get_log_writer():
+    """Process-wide log writer shared by all sessions and streaming threads"""
+    return LogWriter()
+
 # Initialize database for persistent logs
 def init_database():
     """Initialize SQLite database for persistent logs"""
     try:
-        db_path = Path("streaming_logs.db")
+        db_path = Path(LOG_DB_PATH)
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
         
         # Create logs table
         cursor.execute('''
@@ -325,6 +458,79 @@ def init_database():
             )
         ''')
         
+        # Create stream_metrics table for sampled ffmpeg progress
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stream_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                session_id TEXT,
+                batch_index INTEGER NOT NULL,
+                frame INTEGER,
+                fps REAL,
+                bitrate_kbps REAL,
+                speed REAL,
+                drop_frames INTEGER,
+                dup_frames INTEGER,
+                out_time_ms INTEGER
+            )
+        ''')
+        
+        # Create stream_restarts table for automatic reconnects
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stream_restarts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                session_id TEXT,
+                batch_index INTEGER NOT NULL,
+                attempt INTEGER NOT NULL,
+                reason TEXT,
+                exit_code INTEGER,
+                downtime_seconds REAL
+            )
+        ''')
+        
+        # Create transcode_cache table for stream-ready mezzanine files
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transcode_cache (
+                cache_key TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                source_path TEXT,
+                settings TEXT NOT NULL,
+                is_shorts BOOLEAN,
+                output_path TEXT NOT NULL,
+                size_bytes INTEGER DEFAULT 0,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                last_used TEXT NOT NULL
+            )
+        ''')
+        
+        # Create encoder_profiles table for named encoding presets
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS encoder_profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                settings TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        
+        # Create encoder_benchmarks table for host capacity planning
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS encoder_benchmarks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                host TEXT,
+                codec TEXT NOT NULL,
+                preset TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                fps TEXT NOT NULL,
+                bitrate TEXT,
+                speed_per_core REAL NOT NULL
+            )
+        ''')
+        
         # Create saved_channels table for persistent authentication
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS saved_channels (
@@ -338,14 +544,229 @@ def init_database():
         ''')
         
         conn.commit()
+        migrate_database(conn)
         conn.close()
     except Exception as e:
         st.error(f"Database initialization error: {e}")
 
+def _migration_indexes(conn):
+    cursor = conn.cursor()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_session_time ON streaming_logs (session_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_type_time ON streaming_logs (log_type, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_time ON streaming_logs (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_session_batch ON stream_metrics (session_id, batch_index, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_time ON stream_metrics (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_restarts_session_batch ON stream_restarts (session_id, batch_index)")
+
+def _migration_incremental_vacuum(conn):
+    # auto_vacuum only changes on an existing file after a full VACUUM, which cannot run in a transaction
+    conn.commit()
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    # One-time cost: rewrites the whole file and blocks other writers until it is done
+    print(f"Database migration: full VACUUM of {page_count * page_size / 1024 ** 2:.0f} MB to enable incremental "
+          f"auto-vacuum, this can take a while on a large database", file=sys.stderr)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+def _migration_log_fts(conn):
+    # Full-text index over log messages, kept in sync by triggers; skipped if SQLite lacks FTS5
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS streaming_logs_fts USING fts5(message, content='streaming_logs', content_rowid='id')")
+    except sqlite3.OperationalError:
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS streaming_logs_fts_insert AFTER INSERT ON streaming_logs BEGIN
+            INSERT INTO streaming_logs_fts (rowid, message) VALUES (new.id, new.message);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS streaming_logs_fts_delete AFTER DELETE ON streaming_logs BEGIN
+            INSERT INTO streaming_logs_fts (streaming_logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END
+    ''')
+    conn.execute("INSERT INTO streaming_logs_fts (streaming_logs_fts) VALUES ('rebuild')")
+
+def _migration_media_metadata(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS media_metadata (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            probe TEXT,
+            keyframe_interval REAL,
+            content_hash TEXT,
+            probed_at TEXT NOT NULL
+        )
+    ''')
+
+def _migration_media_hash_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_media_content_hash ON media_metadata (content_hash)")
+
+def _migration_scheduled_jobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            channel_name TEXT,
+            spec TEXT NOT NULL,
+            timezone TEXT NOT NULL,
+            cron TEXT,
+            next_run_utc TEXT NOT NULL,
+            duration_seconds INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            live_info TEXT,
+            session_id TEXT,
+            started_at_utc TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_status ON scheduled_jobs (status, next_run_utc)")
+
+def _migration_playlists(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS playlists (
+            name TEXT PRIMARY KEY,
+            items TEXT NOT NULL,
+            shuffle INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS playlist_plays (
+            playlist TEXT NOT NULL,
+            path TEXT NOT NULL,
+            play_count INTEGER NOT NULL DEFAULT 0,
+            last_played TEXT,
+            PRIMARY KEY (playlist, path)
+        )
+    ''')
+
+def _migration_scheduled_job_owner(conn):
+    # Which scheduler runs a job, when it last confirmed that, and the ffmpeg it started
+    conn.execute("ALTER TABLE scheduled_jobs ADD COLUMN owner TEXT")
+    conn.execute("ALTER TABLE scheduled_jobs ADD COLUMN heartbeat_utc TEXT")
+    conn.execute("ALTER TABLE scheduled_jobs ADD COLUMN stream_pid INTEGER")
+
+# Ordered schema migrations; each runs once and is recorded in schema_version
+SCHEMA_MIGRATIONS = [
+    (1, "indexes for log, metrics and restart queries", _migration_indexes),
+    (2, "incremental auto-vacuum", _migration_incremental_vacuum),
+    (3, "full-text index on log messages", _migration_log_fts),
+    (4, "media metadata index", _migration_media_metadata),
+    (5, "content hash lookup for upload dedup", _migration_media_hash_index),
+    (6, "scheduled broadcast jobs", _migration_scheduled_jobs),
+    (7, "playlists and per-item play counts", _migration_playlists),
+    (8, "scheduled job owner and heartbeat", _migration_scheduled_job_owner),
+]
+
+def migrate_database(conn):
+    """Apply pending schema migrations in order; returns the resulting schema version"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    current = cursor.fetchone()[0]
+    
+    for version, description, migration in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        # A failed migration is rolled back and retried on the next startup
+        try:
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                         (version, description, datetime.now().isoformat()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
+
+class LogPruner:
+    """Background retention: deletes expired rows in small chunks and returns free pages to the OS"""
+
+    def __init__(self, db_path=LOG_DB_PATH, interval=LOG_PRUNE_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.interval = interval
+        self.deleted = 0
+        self.last_run = None
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="log-pruner", daemon=True)
+        self._thread.start()
+
+    def _delete_chunked(self, conn, table, condition, params):
+        # Short transactions so the log writer is never blocked for long
+        total = 0
+        while True:
+            cursor = conn.execute(f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM {table} WHERE {condition} LIMIT ?
+                )
+            """, (*params, LOG_PRUNE_CHUNK_ROWS))
+            conn.commit()
+            total += cursor.rowcount
+            if cursor.rowcount < LOG_PRUNE_CHUNK_ROWS:
+                return total
+
+    def prune(self):
+        """Run one retention pass; returns the number of deleted rows"""
+        now = datetime.now()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            deleted = 0
+            for log_type, hours in LOG_RETENTION_HOURS.items():
+                cutoff = (now - timedelta(hours=hours)).isoformat()
+                deleted += self._delete_chunked(conn, "streaming_logs", "log_type = ? AND timestamp < ?", (log_type, cutoff))
+            
+            special_types = list(LOG_RETENTION_HOURS)
+            cutoff = (now - timedelta(hours=LOG_RETENTION_DEFAULT_HOURS)).isoformat()
+            placeholders = ", ".join("?" * len(special_types))
+            deleted += self._delete_chunked(conn, "streaming_logs", f"timestamp < ? AND log_type NOT IN ({placeholders})",
+                                            (cutoff, *special_types))
+            
+            cutoff = (now - timedelta(hours=METRICS_RETENTION_HOURS)).isoformat()
+            deleted += self._delete_chunked(conn, "stream_metrics", "timestamp < ?", (cutoff,))
+            
+            cutoff = (now - timedelta(hours=RESTARTS_RETENTION_HOURS)).isoformat()
+            deleted += self._delete_chunked(conn, "stream_restarts", "timestamp < ?", (cutoff,))
+            
+            if deleted:
+                # executescript steps the pragma to completion; a plain execute frees a single page
+                conn.commit()
+                conn.executescript(f"PRAGMA incremental_vacuum({LOG_VACUUM_PAGES});")
+            self.deleted += deleted
+            self.last_run = now
+            return deleted
+        finally:
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self.prune()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.interval)
+
+@st.cache_resource
+def get_log_pruner():
+    """Process-wide retention pruner"""
+    return LogPruner()
+
 def save_channel_auth(channel_name, channel_id, auth_data):
     """Save channel authentication data persistently"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
+        conn = sqlite3.connect(LOG_DB_PATH)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -370,7 +791,7 @@ def save_channel_auth(channel_name, channel_id, auth_data):
 def load_saved_channels():
     """Load saved channel authentication data"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
+        conn = sqlite3.connect(LOG_DB_PATH)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -398,7 +819,7 @@ def load_saved_channels():
 def update_channel_last_used(channel_name):
     """Update last used timestamp for a channel"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
+        conn = sqlite3.connect(LOG_DB_PATH)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -413,34 +834,25 @@ def update_channel_last_used(channel_name):
         st.error(f"Error updating channel last used: {e}")
 
 def log_to_database(session_id, log_type, message, video_file=None, stream_key=None, channel_name=None):
-    """Log message to database"""
-    try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO streaming_logs 
-            (timestamp, session_id, log_type, message, video_file, stream_key, channel_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(),
-            session_id,
-            log_type,
-            message,
-            video_file,
-            stream_key,
-            channel_name
-        ))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        st.error(f"Error logging to database: {e}")
+    """Queue a log message for the background database writer"""
+    get_log_writer().submit('''
+        INSERT INTO streaming_logs 
+        (timestamp, session_id, log_type, message, video_file, stream_key, channel_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        datetime.now().isoformat(),
+        session_id,
+        log_type,
+        message,
+        video_file,
+        stream_key,
+        channel_name
+    ))
 
 def get_logs_from_database(session_id=None, limit=100):
     """Get logs from database"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
+        conn = sqlite3.connect(LOG_DB_PATH)
         cursor = conn.cursor()
         
         if session_id:
@@ -466,33 +878,274 @@ def get_logs_from_database(session_id=None, limit=100):
         st.error(f"Error getting logs from database: {e}")
         return []
 
+def log_filter_clause(conn, session_id=None, log_types=None, channel_name=None, since=None, until=None, text=None):
+    """SQL WHERE clause and parameters for the log filters shared by queries and exports"""
+    conditions, params = [], []
+    if session_id:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    if log_types:
+        conditions.append(f"log_type IN ({', '.join('?' * len(log_types))})")
+        params.extend(log_types)
+    if channel_name:
+        conditions.append("channel_name = ?")
+        params.append(channel_name)
+    if since:
+        conditions.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        conditions.append("timestamp < ?")
+        params.append(until)
+    if text:
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'streaming_logs_fts'").fetchone()
+        if has_fts:
+            # Quote as one FTS5 phrase so user input is never parsed as query syntax
+            conditions.append("id IN (SELECT rowid FROM streaming_logs_fts WHERE streaming_logs_fts MATCH ?)")
+            params.append('"' + text.replace('"', '""') + '"')
+        else:
+            conditions.append("message LIKE ?")
+            params.append(f"%{text}%")
+    return conditions, params
+
+def query_logs(session_id=None, log_types=None, channel_name=None, since=None, until=None, text=None, cursor=None, limit=100):
+    """Filtered, newest-first log page; returns (rows, next_cursor) with keyset pagination on (timestamp, id)"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        db_cursor = conn.cursor()
+        
+        conditions, params = log_filter_clause(conn, session_id, log_types, channel_name, since, until, text)
+        if cursor:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        db_cursor.execute(f'''
+            SELECT id, timestamp, log_type, message, video_file, channel_name, session_id
+            FROM streaming_logs
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+        
+        rows = db_cursor.fetchall()
+        conn.close()
+    except Exception as e:
+        st.error(f"Error querying logs: {e}")
+        return [], None
+    
+    next_cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def get_log_channels():
+    """Saved channel names for the log channel filter; avoids a DISTINCT scan over all logs"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT channel_name FROM saved_channels ORDER BY channel_name")
+        channels = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return channels
+    except Exception as e:
+        st.error(f"Error loading channel names: {e}")
+        return []
+
+# Log exports are written to disk in chunks, never held in memory as a whole
+EXPORT_DIR = Path("exports")
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_DOWNLOAD_MAX_BYTES = 200 * 1024 * 1024
+EXPORT_COLUMNS = ["id", "timestamp", "session_id", "log_type", "message", "video_file", "channel_name"]
+
+def export_formats():
+    """Available export formats; Parquet only when pyarrow is installed"""
+    formats = {"NDJSON (gzip)": ".ndjson.gz", "CSV (gzip)": ".csv.gz"}
+    try:
+        import pyarrow  # noqa: F401
+        formats["Parquet"] = ".parquet"
+    except ImportError:
+        pass
+    return formats
+
+class LogExporter:
+    """Runs log exports in background threads and tracks their progress"""
+
+    def __init__(self, export_dir=EXPORT_DIR):
+        self.export_dir = Path(export_dir)
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, fmt, filters):
+        """Start an export job; returns its id"""
+        get_log_writer().flush()
+        job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(self.jobs)}"
+        path = self.export_dir / f"streaming_logs_{job_id}{export_formats()[fmt]}"
+        with self._lock:
+            self.jobs[job_id] = {'status': "running", 'format': fmt, 'path': str(path), 'rows': 0, 'total': None, 'error': None}
+        threading.Thread(target=self._run, args=(job_id, fmt, path, filters), name=f"log-export-{job_id}", daemon=True).start()
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            return dict(self.jobs.get(job_id) or {})
+
+    def _progress(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _run(self, job_id, fmt, path, filters):
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        part_path = path.with_name(path.name + ".part")
+        conn = sqlite3.connect(LOG_DB_PATH)
+        try:
+            conditions, params = log_filter_clause(conn, **filters)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            # One read transaction so the count and the rows come from the same WAL snapshot
+            conn.execute("BEGIN")
+            total = conn.execute(f"SELECT COUNT(*) FROM streaming_logs {where}", params).fetchone()[0]
+            self._progress(job_id, total=total)
+            
+            cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM streaming_logs {where} ORDER BY timestamp, id", params)
+            writer = self._open_writer(fmt, part_path)
+            try:
+                rows = 0
+                while True:
+                    chunk = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not chunk:
+                        break
+                    writer['write'](chunk)
+                    rows += len(chunk)
+                    self._progress(job_id, rows=rows)
+            finally:
+                writer['close']()
+            conn.rollback()
+            
+            os.replace(part_path, path)
+            self._progress(job_id, status="done", size_bytes=path.stat().st_size)
+        except Exception as e:
+            self._progress(job_id, status="failed", error=str(e))
+            if part_path.exists():
+                part_path.unlink()
+        finally:
+            conn.close()
+
+    def _open_writer(self, fmt, path):
+        """Chunk writer for one format as {'write': fn(rows), 'close': fn()}"""
+        if fmt == "Parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(name, pa.int64() if name == "id" else pa.string()) for name in EXPORT_COLUMNS])
+            parquet_writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+            
+            def write_parquet(rows):
+                columns = list(zip(*rows))
+                parquet_writer.write_table(pa.table({name: list(col) for name, col in zip(EXPORT_COLUMNS, columns)}, schema=schema))
+            return {'write': write_parquet, 'close': parquet_writer.close}
+        
+        handle = gzip.open(path, "wt", encoding="utf-8", newline="")
+        if fmt == "CSV (gzip)":
+            csv_writer = csv.writer(handle)
+            csv_writer.writerow(EXPORT_COLUMNS)
+            return {'write': csv_writer.writerows, 'close': handle.close}
+        
+        def write_ndjson(rows):
+            handle.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+        return {'write': write_ndjson, 'close': handle.close}
+
+@st.cache_resource
+def get_log_exporter():
+    """Process-wide exporter so jobs keep running across reruns"""
+    return LogExporter()
+
+def render_export_status(job_id, refreshing=False):
+    """Export progress panel; runs as a fragment that refreshes until the job finishes"""
+    job = get_log_exporter().status(job_id)
+    if not job:
+        return
+    if refreshing and job['status'] != "running":
+        # Full rerun so the fragment stops auto-refreshing
+        st.rerun()
+    if job['status'] == "running":
+        total = job['total'] or 0
+        st.progress(min(job['rows'] / total, 1.0) if total else 0.0, text=f"Exporting {job['rows']:,} / {total:,} rows...")
+    elif job['status'] == "failed":
+        st.error(f"❌ Export failed: {job['error']}")
+    else:
+        st.success(f"✅ Exported {job['rows']:,} rows to {job['path']}")
+        if job['size_bytes'] > EXPORT_DOWNLOAD_MAX_BYTES:
+            st.info("File is too large for a browser download; copy it from the server path above.")
+        elif st.session_state.get('export_download_ready') == job_id or st.button("📦 Prepare Download", key=f"prepare_export_{job_id}"):
+            # Streamlit holds download data in memory, so the file is only read on request, not on every rerun
+            st.session_state['export_download_ready'] = job_id
+            with open(job['path'], "rb") as f:
+                if st.download_button(
+                    label="💾 Download Logs",
+                    data=f,
+                    file_name=os.path.basename(job['path']),
+                    mime="application/octet-stream",
+                    key=f"download_export_{job_id}"
+                ):
+                    st.session_state.pop('export_download_ready', None)
+
 def save_streaming_session(session_id, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name):
-    """Save streaming session to database"""
+    """Queue a streaming session record for the background database writer"""
+    get_log_writer().submit('''
+        INSERT OR REPLACE INTO streaming_sessions 
+        (session_id, start_time, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        session_id,
+        datetime.now().isoformat(),
+        video_file,
+        stream_title,
+        stream_description,
+        tags,
+        category,
+        privacy_status,
+        made_for_kids,
+        channel_name
+    ))
+
+def save_stream_metrics(session_id, batch_index, metrics):
+    """Queue a sampled ffmpeg progress record for the background database writer"""
+    get_log_writer().submit('''
+        INSERT INTO stream_metrics 
+        (timestamp, session_id, batch_index, frame, fps, bitrate_kbps, speed, drop_frames, dup_frames, out_time_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        datetime.now().isoformat(),
+        session_id,
+        batch_index,
+        metrics.get('frame'),
+        metrics.get('fps'),
+        metrics.get('bitrate_kbps'),
+        metrics.get('speed'),
+        metrics.get('drop_frames'),
+        metrics.get('dup_frames'),
+        metrics.get('out_time_ms')
+    ))
+
+def get_latest_stream_metrics(session_id):
+    """Get the most recent metrics sample for each batch of a session"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
+        conn = sqlite3.connect(LOG_DB_PATH)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT OR REPLACE INTO streaming_sessions 
-            (session_id, start_time, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            session_id,
-            datetime.now().isoformat(),
-            video_file,
-            stream_title,
-            stream_description,
-            tags,
-            category,
-            privacy_status,
-            made_for_kids,
-            channel_name
-        ))
+            SELECT batch_index, timestamp, frame, fps, bitrate_kbps, speed, drop_frames, dup_frames, out_time_ms
+            FROM stream_metrics
+            WHERE id IN (
+                SELECT MAX(id) FROM stream_metrics
+                WHERE session_id = ?
+                GROUP BY batch_index
+            )
+            ORDER BY batch_index
+        ''', (session_id,))
         
-        conn.commit()
+        metrics = cursor.fetchall()
         conn.close()
+        return metrics
     except Exception as e:
-        st.error(f"Error saving streaming session: {e}")
+        st.error(f"Error getting stream metrics: {e}")
+        return []
 
 def load_google_oauth_config(json_file):
     """Load Google OAuth configuration from downloaded JSON file"""
@@ -579,22 +1232,149 @@ def validate_channel_config(config):
     
     return True, "Valid configuration"
 
-def create_youtube_service(credentials_dict):
-    """Create YouTube API service from credentials"""
-    try:
-        if 'token' in credentials_dict:
-            credentials = Credentials.from_authorized_user_info(credentials_dict)
-        else:
-            credentials = Credentials(
-                token=credentials_dict.get('access_token'),
-                refresh_token=credentials_dict.get('refresh_token'),
-                token_uri=credentials_dict.get('token_uri', 'https://oauth2.googleapis.com/token'),
-                client_id=credentials_dict.get('client_id'),
-                client_secret=credentials_dict.get('client_secret'),
-                scopes=['https://www.googleapis.com/auth/youtube.force-ssl']
-            )
-        service = build('youtube', 'v3', credentials=credentials)
+# Access tokens are refreshed this long before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+TOKEN_REFRESH_CHECK_SECONDS = 60
+YOUTUBE_SCOPES = ['https://www.googleapis.com/auth/youtube.force-ssl']
+
+def credentials_from_dict(credentials_dict):
+    """google.oauth2 Credentials from either saved auth format"""
+    Credentials = import_optional("google.oauth2.credentials", "google-auth").Credentials
+    if 'token' in credentials_dict:
+        return Credentials.from_authorized_user_info(credentials_dict)
+    expiry = credentials_dict.get('expiry')
+    return Credentials(
+        token=credentials_dict.get('access_token'),
+        refresh_token=credentials_dict.get('refresh_token'),
+        token_uri=credentials_dict.get('token_uri', 'https://oauth2.googleapis.com/token'),
+        client_id=credentials_dict.get('client_id'),
+        client_secret=credentials_dict.get('client_secret'),
+        scopes=YOUTUBE_SCOPES,
+        # google-auth compares expiry as naive UTC
+        expiry=datetime.fromisoformat(expiry.rstrip('Z')).replace(tzinfo=None) if expiry else None
+    )
+
+class ThreadLocalHttp:
+    """Authorized HTTP that keeps one pooled httplib2 connection per thread; a shared Http is not thread-safe"""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+
+    def _http(self):
+        if not hasattr(self._local, 'http'):
+            httplib2 = import_optional("httplib2", "httplib2")
+            google_auth_httplib2 = import_optional("google_auth_httplib2", "google-auth-httplib2")
+            self._local.http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return self._local.http
+
+    def request(self, *args, **kwargs):
+        return self._http().request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._http(), name)
+
+class YouTubeServiceRegistry:
+    """Built YouTube clients per channel, shared by all sessions, with proactive token refresh"""
+
+    def __init__(self):
+        self._services = {}
+        self._lock = threading.Lock()
+        self.refresh_errors = {}
+        self._thread = threading.Thread(target=self._run, name="youtube-token-refresh", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _token_key(credentials_dict):
+        token = credentials_dict.get('refresh_token') or credentials_dict.get('access_token') or credentials_dict.get('token') or ""
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+
+    def get(self, credentials_dict, channel_id=None):
+        """Cached service for a channel, built on first use"""
+        key = channel_id or self._token_key(credentials_dict)
+        with self._lock:
+            entry = self._services.get(key)
+            # A re-authorization brings a new refresh token and replaces the cached client
+            if entry and entry['credentials'].refresh_token == credentials_dict.get('refresh_token'):
+                return entry['service']
+        
+        credentials = credentials_from_dict(credentials_dict)
+        build = import_optional("googleapiclient.discovery", "google-api-python-client").build
+        # static_discovery uses the discovery document bundled with the client library
+        service = build('youtube', 'v3', http=ThreadLocalHttp(credentials), static_discovery=True, cache_discovery=False)
+        with self._lock:
+            self._services[key] = {
+                'service': service,
+                'credentials': credentials,
+                'auth': dict(credentials_dict),
+                'channel_id': channel_id
+            }
         return service
+
+    def assign_channel(self, service, channel_id):
+        """Re-key a service built before its channel was known, so refreshed tokens can be saved"""
+        with self._lock:
+            for key, entry in list(self._services.items()):
+                if entry['service'] is service and key != channel_id:
+                    entry['channel_id'] = channel_id
+                    self._services[channel_id] = self._services.pop(key)
+
+    def refresh_due(self):
+        """Refresh every token that expires within the margin; returns the refreshed channel keys"""
+        Request = import_optional("google.auth.transport.requests", "google-auth").Request
+        
+        with self._lock:
+            entries = list(self._services.items())
+        refreshed = []
+        for key, entry in entries:
+            credentials = entry['credentials']
+            if not credentials.refresh_token:
+                continue
+            expiry = credentials.expiry
+            if credentials.token and expiry and expiry - datetime.utcnow() > timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS):
+                continue
+            try:
+                credentials.refresh(Request())
+                self.refresh_errors.pop(key, None)
+            except Exception as e:
+                self.refresh_errors[key] = str(e)
+                log_to_database(None, "ERROR", f"Token refresh failed for channel {entry['channel_id'] or key}: {e}")
+                continue
+            if entry['channel_id']:
+                save_refreshed_token(entry['channel_id'], entry['auth'], credentials)
+            refreshed.append(key)
+        return refreshed
+
+    def _run(self):
+        while True:
+            time.sleep(TOKEN_REFRESH_CHECK_SECONDS)
+            try:
+                self.refresh_due()
+            except Exception as e:
+                log_to_database(None, "ERROR", f"Token refresh pass failed: {e}")
+
+@st.cache_resource
+def get_youtube_registry():
+    """Process-wide YouTube service registry"""
+    return YouTubeServiceRegistry()
+
+def save_refreshed_token(channel_id, auth_data, credentials):
+    """Write a refreshed access token back into the channel's saved auth"""
+    token_field = 'token' if 'token' in auth_data else 'access_token'
+    auth_data[token_field] = credentials.token
+    auth_data['expiry'] = credentials.expiry.isoformat() if credentials.expiry else None
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute("UPDATE saved_channels SET auth_data = ? WHERE channel_id = ?", (json.dumps(auth_data), channel_id))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log_to_database(None, "ERROR", f"Could not save refreshed token for channel {channel_id}: {e}")
+
+def create_youtube_service(credentials_dict, channel_id=None):
+    """Get the shared YouTube API service for these credentials"""
+    try:
+        return get_youtube_registry().get(credentials_dict, channel_id)
     except Exception as e:
         st.error(f"Error creating YouTube service: {e}")
         return None
@@ -647,82 +1427,86 @@ def get_channel_info(service, channel_id=None):
         st.error(f"Error fetching channel info: {e}")
         return []
 
-def create_live_stream(service, title, description, scheduled_start_time, tags=None, category_id="20", privacy_status="public", made_for_kids=False):
-    """Create a live stream on YouTube with complete settings"""
-    try:
-        # Create live stream
-        stream_request = service.liveStreams().insert(
-            part="snippet,cdn",
-            body={
-                "snippet": {
-                    "title": title,
-                    "description": description
-                },
-                "cdn": {
-                    "resolution": "1080p",
-                    "frameRate": "30fps",
-                    "ingestionType": "rtmp"
-                }
-            }
-        )
-        stream_response = stream_request.execute()
-        
-        # Prepare broadcast body
-        broadcast_body = {
+def _create_live_stream(service, title, description, scheduled_start_time, tags=None, category_id="20", privacy_status="public", made_for_kids=False, num_retries=0):
+    """Create and bind a YouTube live stream and broadcast; raises on API errors"""
+    # Create live stream
+    stream_request = service.liveStreams().insert(
+        part="snippet,cdn",
+        body={
             "snippet": {
                 "title": title,
-                "description": description,
-                "scheduledStartTime": scheduled_start_time.isoformat()
-            },
-            "status": {
-                "privacyStatus": privacy_status,
-                "selfDeclaredMadeForKids": made_for_kids,
-                "enableAutoStart": True,  # Auto start live stream
-                "enableAutoStop": True    # Auto stop when video ends
+                "description": description
             },
-            "contentDetails": {
-                "enableAutoStart": True,
-                "enableAutoStop": True,
-                "recordFromStart": True,
-                "enableContentEncryption": False,
-                "enableEmbed": True,
-                "enableDvr": True,
-                "enableLowLatency": False
+            "cdn": {
+                "resolution": "1080p",
+                "frameRate": "30fps",
+                "ingestionType": "rtmp"
             }
         }
-        
-        # Add tags if provided
-        if tags:
-            broadcast_body["snippet"]["tags"] = tags
-            
-        # Add category if provided
-        if category_id:
-            broadcast_body["snippet"]["categoryId"] = category_id
-        
-        # Create live broadcast
-        broadcast_request = service.liveBroadcasts().insert(
-            part="snippet,status,contentDetails",
-            body=broadcast_body
-        )
-        broadcast_response = broadcast_request.execute()
-        
-        # Bind stream to broadcast
-        bind_request = service.liveBroadcasts().bind(
-            part="id,contentDetails",
-            id=broadcast_response['id'],
-            streamId=stream_response['id']
-        )
-        bind_response = bind_request.execute()
-        
-        return {
-            "stream_key": stream_response['cdn']['ingestionInfo']['streamName'],
-            "stream_url": stream_response['cdn']['ingestionInfo']['ingestionAddress'],
-            "broadcast_id": broadcast_response['id'],
-            "stream_id": stream_response['id'],
-            "watch_url": f"https://www.youtube.com/watch?v={broadcast_response['id']}",
-            "studio_url": f"https://studio.youtube.com/video/{broadcast_response['id']}/livestreaming",
-            "broadcast_response": broadcast_response
+    )
+    stream_response = stream_request.execute(num_retries=num_retries)
+    
+    # Prepare broadcast body
+    broadcast_body = {
+        "snippet": {
+            "title": title,
+            "description": description,
+            "scheduledStartTime": scheduled_start_time.isoformat()
+        },
+        "status": {
+            "privacyStatus": privacy_status,
+            "selfDeclaredMadeForKids": made_for_kids,
+            "enableAutoStart": True,  # Auto start live stream
+            "enableAutoStop": True    # Auto stop when video ends
+        },
+        "contentDetails": {
+            "enableAutoStart": True,
+            "enableAutoStop": True,
+            "recordFromStart": True,
+            "enableContentEncryption": False,
+            "enableEmbed": True,
+            "enableDvr": True,
+            "enableLowLatency": False
         }
+    }
+    
+    # Add tags if provided
+    if tags:
+        broadcast_body["snippet"]["tags"] = tags
+        
+    # Add category if provided
+    if category_id:
+        broadcast_body["snippet"]["categoryId"] = category_id
+    
+    # Create live broadcast
+    broadcast_request = service.liveBroadcasts().insert(
+        part="snippet,status,contentDetails",
+        body=broadcast_body
+    )
+    broadcast_response = broadcast_request.execute(num_retries=num_retries)
+    
+    # Bind stream to broadcast
+    bind_request = service.liveBroadcasts().bind(
+        part="id,contentDetails",
+        id=broadcast_response['id'],
+        streamId=stream_response['id']
+    )
+    bind_response = bind_request.execute(num_retries=num_retries)
+    
+    return {
+        "stream_key": stream_response['cdn']['ingestionInfo']['streamName'],
+        "stream_url": stream_response['cdn']['ingestionInfo']['ingestionAddress'],
+        "broadcast_id": broadcast_response['id'],
+        "stream_id": stream_response['id'],
+        "watch_url": f"https://www.youtube.com/watch?v={broadcast_response['id']}",
+        "studio_url": f"https://studio.youtube.com/video/{broadcast_response['id']}/livestreaming",
+        "broadcast_response": broadcast_response
+    }
+
+def create_live_stream(service, title, description, scheduled_start_time, tags=None, category_id="20", privacy_status="public", made_for_kids=False):
+    """Create a live stream on YouTube with complete settings"""
+    try:
+        return _create_live_stream(service, title, description, scheduled_start_time, tags, category_id, privacy_status, made_for_kids)
     except Exception as e:
         st.error(f"Error creating live stream: {e}")
         return None
@@ -781,84 +1565,1697 @@ def get_broadcast_stream_key(service, broadcast_id):
         return None
 
 def get_video_duration(video_path):
-    """Get video duration in seconds using ffprobe."""
+    """Get video duration in seconds from the media metadata index."""
+    try:
+        media = get_media_index().get(video_path)
+        return float(media['probe']['format']['duration'])
+    except Exception as e:
+        st.warning(f"Tidak dapat membaca durasi video: {e}")
+        return None
+
+# Limits for sending a source to YouTube with -c copy instead of re-encoding
+STREAM_COPY_VIDEO_PROFILES = {"Baseline", "Constrained Baseline", "Main", "High"}
+STREAM_COPY_AUDIO_RATES = {44100, 48000}
+STREAM_COPY_MAX_KEYFRAME_SECONDS = 4
+STREAM_COPY_BITRATE_TOLERANCE = 1.25
+
+def probe_video(video_path):
+    """Get container and stream information for a video using ffprobe"""
     try:
         result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", video_path],
+            ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", video_path],
             capture_output=True,
             text=True
         )
-        return float(result.stdout.strip())
-    except Exception as e:
-        st.warning(f"Tidak dapat membaca durasi video: {e}")
+        if result.returncode != 0:
+            return None
+        return json.loads(result.stdout)
+    except Exception:
         return None
 
-def run_ffmpeg(video_path, stream_key, is_shorts, log_callback, rtmp_url=None, session_id=None, duration_limit=None, video_settings=None, batch_index=0):
-    """Run FFmpeg for streaming with optional duration limit and custom video settings."""
-    output_url = rtmp_url or f"rtmp://a.rtmp.youtube.com/live2/{stream_key}"
-    
-    # Default video settings
-    if video_settings is None:
-        video_settings = {
-            "resolution": "1080p",
-            "bitrate": "2500k",
-            "fps": "30",
-            "codec": "libx264",
-            "audio_bitrate": "128k",
-            "audio_codec": "aac"
-        }
-    
-    # Build FFmpeg command with custom settings
-    cmd = [
-        "ffmpeg", "-re", "-stream_loop", "-1", "-i", video_path,
-        "-c:v", video_settings["codec"], "-preset", "veryfast", 
-        "-b:v", video_settings["bitrate"], "-maxrate", video_settings["bitrate"],
-        "-bufsize", str(int(video_settings["bitrate"].replace('k', '')) * 2) + "k",
-        "-r", video_settings["fps"], "-g", str(int(video_settings["fps"]) * 2),
-        "-keyint_min", str(int(video_settings["fps"]) * 2),
-        "-c:a", video_settings["audio_codec"], "-b:a", video_settings["audio_bitrate"],
-        "-f", "flv"
-    ]
-    
-    # Add scaling for Shorts mode if enabled
-    if is_shorts:
-        cmd.extend(["-vf", "scale=720:1280"])
-    
-    # Add duration limit if specified
-    if duration_limit:
-        cmd.insert(1, str(duration_limit))
-        cmd.insert(1, "-t")
-    
-    cmd.append(output_url)
-    
-    start_msg = f"🚀 Batch {batch_index}: Starting FFmpeg with settings: {' '.join(cmd[:8])}... [RTMP URL hidden for security]"
-    log_callback(start_msg)
-    if session_id:
-        log_to_database(session_id, "INFO", f"Batch {batch_index}: {start_msg}", video_path)
-    
+def probe_keyframe_interval(video_path, window_seconds=30):
+    """Get the largest keyframe gap in seconds over the first part of a video"""
     try:
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        for line in process.stdout:
-            log_callback(f"Batch {batch_index}: {line.strip()}")
-            if session_id:
-                log_to_database(session_id, "FFMPEG", f"Batch {batch_index}: {line.strip()}", video_path)
-        process.wait()
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=best_effort_timestamp_time", "-read_intervals", f"%+{window_seconds}",
+             "-of", "json", video_path],
+            capture_output=True,
+            text=True
+        )
+        frames = json.loads(result.stdout).get('frames', [])
+        times = sorted(float(f['best_effort_timestamp_time']) for f in frames if 'best_effort_timestamp_time' in f)
+        if len(times) < 2:
+            return None
+        return max(b - a for a, b in zip(times, times[1:]))
+    except Exception:
+        return None
+
+# In-process LRU size on top of the persistent media_metadata table
+MEDIA_INDEX_LRU_SIZE = 512
+
+class MediaIndex:
+    """ffprobe results per file, persisted in SQLite and valid while size and mtime are unchanged"""
+
+    def __init__(self, lru_size=MEDIA_INDEX_LRU_SIZE):
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="media-index", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _file_id(video_path):
+        stat = os.stat(video_path)
+        return (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+
+    def _remember(self, file_id, entry):
+        with self._lock:
+            self._lru[file_id] = entry
+            self._lru.move_to_end(file_id)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _load(self, file_id):
+        with self._lock:
+            if file_id in self._lru:
+                self._lru.move_to_end(file_id)
+                return self._lru[file_id]
         
-        end_msg = f"✅ Batch {batch_index}: Streaming completed successfully"
-        log_callback(end_msg)
-        if session_id:
-            log_to_database(session_id, "INFO", f"Batch {batch_index}: {end_msg}", video_path)
-            
-    except Exception as e:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        row = conn.execute('''
+            SELECT probe, keyframe_interval, content_hash FROM media_metadata
+            WHERE path = ? AND size = ? AND mtime = ?
+        ''', file_id).fetchone()
+        conn.close()
+        if not row:
+            return None
+        entry = {'probe': json.loads(row[0]) if row[0] else None, 'keyframe_interval': row[1], 'content_hash': row[2]}
+        self._remember(file_id, entry)
+        return entry
+
+    def _probe(self, video_path, file_id, content_hash=None):
+        entry = {
+            'probe': probe_video(video_path),
+            'keyframe_interval': probe_keyframe_interval(video_path),
+            'content_hash': content_hash
+        }
+        self._store(file_id, entry)
+        return entry
+
+    def _store(self, file_id, entry):
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute('''
+            INSERT OR REPLACE INTO media_metadata (path, size, mtime, probe, keyframe_interval, content_hash, probed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (*file_id, json.dumps(entry['probe']) if entry['probe'] else None,
+              entry['keyframe_interval'], entry['content_hash'], datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+        self._remember(file_id, entry)
+
+    def get(self, video_path, wait=True):
+        """Metadata entry {'probe', 'keyframe_interval', 'content_hash'}; with wait=False never runs ffprobe here"""
+        try:
+            file_id = self._file_id(video_path)
+        except OSError:
+            return None
+        entry = self._load(file_id)
+        if entry:
+            return entry
+        if not wait:
+            self.schedule(video_path)
+            return None
+        return self._probe(video_path, file_id)
+
+    def schedule(self, video_path, content_hash=None):
+        """Probe a file in the background if it is not indexed or queued yet; a known hash is stored with it"""
+        path = os.path.abspath(video_path)
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self.jobs.put((path, content_hash))
+
+    def find_by_hash(self, content_hash):
+        """Path of an existing, unchanged file with this content hash, or None"""
+        conn = sqlite3.connect(LOG_DB_PATH)
+        rows = conn.execute("SELECT path, size, mtime FROM media_metadata WHERE content_hash = ?", (content_hash,)).fetchall()
+        conn.close()
+        for path, size, mtime in rows:
+            try:
+                if self._file_id(path) == (path, size, mtime):
+                    return path
+            except OSError:
+                continue
+        return None
+
+    def cached_hash(self, video_path):
+        """Content hash if it was already computed for this exact file version"""
+        entry = self.get(video_path, wait=False)
+        return entry['content_hash'] if entry else None
+
+    def content_hash(self, video_path):
+        """Content hash, computed once per file version and persisted"""
+        file_id = self._file_id(video_path)
+        entry = self._load(file_id) or self._probe(video_path, file_id)
+        if not entry['content_hash']:
+            entry = dict(entry, content_hash=file_content_hash(video_path))
+            self._store(file_id, entry)
+        return entry['content_hash']
+
+    def _run(self):
+        while True:
+            path, content_hash = self.jobs.get()
+            try:
+                file_id = self._file_id(path)
+                if not self._load(file_id):
+                    self._probe(path, file_id, content_hash)
+            except Exception as e:
+                log_to_database(None, "ERROR", f"Media probe failed for {path}: {e}", path)
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+@st.cache_resource
+def get_media_index():
+    """Process-wide media metadata index"""
+    return MediaIndex()
+
+def media_label(video_path):
+    """Picker label like 'loop.mp4  (0:12:30 · 1920x1080 · h264)'; just the name until the file is probed"""
+    # Runs for every option on every rerun, so it only reads the library's in-memory catalog
+    summary = get_media_library().summary(video_path)
+    return f"{video_path}  ({summary})" if summary else video_path
+
+def media_summary(probe):
+    """Short duration · resolution · codec · stream status text for a probe result"""
+    video = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), {})
+    parts = []
+    duration = probe.get('format', {}).get('duration')
+    if duration:
+        parts.append(str(timedelta(seconds=int(float(duration)))))
+    if video.get('width'):
+        parts.append(f"{video['width']}x{video['height']}")
+    if video.get('codec_name'):
+        parts.append(video['codec_name'])
+    parts.append(media_stream_status(probe))
+    return " · ".join(parts)
+
+# Media library: directories to index recursively and how often to poll them
+VIDEO_EXTENSIONS = ('.mp4', '.flv', '.avi', '.mov', '.mkv')
+MEDIA_DIRS = [d for d in os.environ.get("MEDIA_DIRS", ".").split(os.pathsep) if d]
+MEDIA_SCAN_INTERVAL_SECONDS = 5
+MEDIA_SCAN_DEBOUNCE_SECONDS = 2
+MEDIA_SCAN_EXCLUDE_DIRS = {"transcode_cache", "exports", "__pycache__", "node_modules"}
+
+class MediaLibrary:
+    """Polls media directories in the background and keeps a sorted in-memory catalog"""
+
+    def __init__(self, dirs=None, interval=MEDIA_SCAN_INTERVAL_SECONDS, debounce=MEDIA_SCAN_DEBOUNCE_SECONDS):
+        self.dirs = dirs or MEDIA_DIRS
+        self.interval = interval
+        self.debounce = debounce
+        self.catalog = []
+        self.last_scan = None
+        self._files = {}
+        self._by_path = {}
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="media-library", daemon=True)
+        self._thread.start()
+
+    def _walk(self, directory):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in MEDIA_SCAN_EXCLUDE_DIRS:
+                            yield from self._walk(entry.path)
+                    elif entry.name.lower().endswith(VIDEO_EXTENSIONS) and not entry.name.endswith('.part'):
+                        yield entry
+        except OSError:
+            return
+
+    def scan(self):
+        """One polling pass; returns True if the catalog changed"""
+        now = time.time()
+        files = {}
+        for directory in self.dirs:
+            for entry in self._walk(directory):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                # Files still being written settle first so they are not probed half-copied
+                if now - stat.st_mtime < self.debounce:
+                    continue
+                path = os.path.normpath(os.path.relpath(entry.path))
+                files[path] = (stat.st_size, stat.st_mtime)
+        
+        changed = files != self._files
+        if changed:
+            for path, version in files.items():
+                if self._files.get(path) != version:
+                    get_media_index().schedule(path)
+            # Unchanged files keep their probe summary
+            self.catalog = [
+                {'path': path, 'size': size, 'mtime': mtime,
+                 'summary': self._by_path[path]['summary'] if self._files.get(path) == (size, mtime) else None}
+                for path, (size, mtime) in sorted(files.items(), key=lambda item: item[0].lower())
+            ]
+            self._files = files
+            self._by_path = {item['path']: item for item in self.catalog}
+        
+        # Summaries are filled in here, off the UI thread, once the index has probed a file
+        for item in self.catalog:
+            if item['summary'] is None:
+                media = get_media_index().get(item['path'], wait=False)
+                if media:
+                    item['summary'] = media_summary(media['probe']) if media['probe'] else ""
+        self.last_scan = datetime.now()
+        return changed
+
+    def summary(self, video_path):
+        """Cached probe summary of a catalog file, or None if unknown or not probed yet"""
+        item = self._by_path.get(os.path.normpath(video_path))
+        return item['summary'] if item else None
+
+    def rescan(self):
+        """Ask the poller for an immediate pass, e.g. after an upload"""
+        self._wake.set()
+
+    def videos(self, wait=1.0):
+        """Catalog paths; waits briefly for the very first scan"""
+        self._ready.wait(timeout=wait)
+        return [item['path'] for item in self.catalog]
+
+    def _run(self):
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                log_to_database(None, "ERROR", f"Media library scan failed: {e}")
+            self._ready.set()
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+
+@st.cache_resource
+def get_media_library():
+    """Process-wide media library"""
+    return MediaLibrary()
+
+# Uploads stream into this directory (inside the default media library) in chunks
+MEDIA_UPLOAD_DIR = Path(os.environ.get("MEDIA_UPLOAD_DIR", "media"))
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+def safe_media_name(filename):
+    """Client-supplied file name reduced to a safe base name with a video extension"""
+    name = re.sub(r"[^\w.\- ]", "_", os.path.basename(filename or "")).strip(" .")
+    if not name.lower().endswith(VIDEO_EXTENSIONS):
+        raise ValueError(f"Unsupported video file: {filename}")
+    return name
+
+def store_media_upload(read_chunk, filename, upload_dir=MEDIA_UPLOAD_DIR, expected_bytes=None):
+    """Stream an upload to disk chunk by chunk; returns (path, duplicate)
+    
+    read_chunk(size) returns the next bytes, b"" at the end. The content is hashed while
+    writing, identical media already in the library is reused, and the file only
+    appears under its final name once complete. A short upload (fewer than
+    expected_bytes) raises ValueError and leaves nothing behind.
+    """
+    name = safe_media_name(filename)
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    part_path = upload_dir / f".upload-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}.part"
+    
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        with open(part_path, "wb") as f:
+            for chunk in iter(lambda: read_chunk(UPLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                f.write(chunk)
+                received += len(chunk)
+        if expected_bytes is not None and received != expected_bytes:
+            raise ValueError(f"Incomplete upload of {filename}: received {received} of {expected_bytes} bytes")
+        content_hash = digest.hexdigest()
+        
+        media_index = get_media_index()
+        existing = media_index.find_by_hash(content_hash)
+        if existing:
+            part_path.unlink()
+            return os.path.relpath(existing), True
+        
+        # Never overwrite a different file that has the same name
+        final_path = upload_dir / name
+        stem, suffix = os.path.splitext(name)
+        counter = 1
+        while final_path.exists():
+            final_path = upload_dir / f"{stem}-{counter}{suffix}"
+            counter += 1
+        os.replace(part_path, final_path)
+    except BaseException:
+        if part_path.exists():
+            part_path.unlink()
+        raise
+    
+    media_index.schedule(final_path, content_hash)
+    get_media_library().rescan()
+    return str(final_path), False
+
+def media_stream_status(probe):
+    """'stream-ready' when the source is already h264/aac in yuv420p, otherwise 'needs encode'"""
+    streams = probe.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    if video.get('codec_name') == 'h264' and video.get('pix_fmt') == 'yuv420p' and audio.get('codec_name') == 'aac':
+        return "📦 stream-ready"
+    return "🎛️ needs encode"
+
+# Playlist items that are not stream-ready are encoded quickly before the persistent output re-encodes them
+PLAYLIST_ITEM_ENCODE_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p",
+                             "-c:a", "aac", "-b:a", "192k", "-ar", "44100"]
+PLAYLIST_PIPE_CHUNK_BYTES = 64 * 1024
+PLAYLIST_EMPTY_WAIT_SECONDS = 5
+
+def save_playlist(name, items, shuffle=False):
+    """Create or replace a playlist; running streams pick up the change at their next item"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute('''
+            INSERT INTO playlists (name, items, shuffle, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET items = excluded.items, shuffle = excluded.shuffle, updated_at = excluded.updated_at
+        ''', (name, json.dumps(list(items)), int(bool(shuffle)), datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error saving playlist: {e}")
+        return False
+
+def load_playlists():
+    """All playlists as {name: {'items', 'shuffle', 'updated_at'}}"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, items, shuffle, updated_at FROM playlists ORDER BY name")
+        playlists = {
+            name: {'items': json.loads(items), 'shuffle': bool(shuffle), 'updated_at': updated_at}
+            for name, items, shuffle, updated_at in cursor.fetchall()
+        }
+        conn.close()
+        return playlists
+    except Exception as e:
+        st.error(f"Error loading playlists: {e}")
+        return {}
+
+def load_playlist(name):
+    """One playlist, or None if it does not exist"""
+    return load_playlists().get(name)
+
+def rename_playlist(old_name, new_name):
+    """Rename a playlist in place, keeping its play counts"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        with conn:
+            conn.execute("UPDATE playlists SET name = ?, updated_at = ? WHERE name = ?",
+                         (new_name, datetime.now().isoformat(), old_name))
+            conn.execute("UPDATE playlist_plays SET playlist = ? WHERE playlist = ?", (new_name, old_name))
+        conn.close()
+        return True
+    except sqlite3.IntegrityError:
+        st.error(f"A playlist named {new_name} already exists")
+        return False
+    except Exception as e:
+        st.error(f"Error renaming playlist: {e}")
+        return False
+
+def delete_playlist(name):
+    """Delete a playlist and its play counts"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute("DELETE FROM playlists WHERE name = ?", (name,))
+        conn.execute("DELETE FROM playlist_plays WHERE playlist = ?", (name,))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error deleting playlist: {e}")
+        return False
+
+def record_playlist_play(name, path):
+    """Count one play of a playlist item"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute('''
+            INSERT INTO playlist_plays (playlist, path, play_count, last_played) VALUES (?, ?, 1, ?)
+            ON CONFLICT(playlist, path) DO UPDATE SET play_count = play_count + 1, last_played = excluded.last_played
+        ''', (name, path, datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log_to_database(None, "ERROR", f"Playlist {name}: failed to record play of {path}: {e}")
+
+def load_playlist_plays(name):
+    """Play counts of a playlist as {path: (play_count, last_played)}"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT path, play_count, last_played FROM playlist_plays WHERE playlist = ?", (name,))
+        plays = {path: (count, last_played) for path, count, last_played in cursor.fetchall()}
+        conn.close()
+        return plays
+    except Exception as e:
+        st.error(f"Error loading play counts: {e}")
+        return {}
+
+def playlist_video_label(name):
+    """Stand-in video path shown in logs and sessions for a playlist batch"""
+    return f"playlist:{name}"
+
+class PlaylistFeeder:
+    """Feeds the items of a saved playlist into one persistent ffmpeg through its stdin
+
+    Each item is remuxed to MPEG-TS (or quickly encoded if it is not h264/aac) with its
+    timestamps offset to follow the previous item, so the output process sees one
+    continuous input and its RTMP connection stays up. The playlist is re-read before
+    every item, so edits take effect from the next item on.
+    """
+
+    def __init__(self, name, batch_index=0, log_callback=None, on_item=None):
+        self.name = name
+        self.batch_index = batch_index
+        self.log_callback = log_callback or (lambda msg: None)
+        self.on_item = on_item or (lambda path: None)
+        self._items = None
+        self._shuffle = False
+        self._order = []
+        self._last_path = None
+        self._missing = False
+
+    def next_item(self):
+        """Next path to play, or None when the playlist is empty or was never found"""
+        playlist = load_playlist(self.name)
+        if playlist:
+            self._missing = False
+        elif self._items is None:
+            return None
+        else:
+            # Deleted or renamed underneath a live stream: keep rotating its last known items
+            # rather than starving the output and ending the broadcast
+            if not self._missing:
+                self.log_callback(f"⚠️ Batch {self.batch_index}: Playlist '{self.name}' no longer exists, replaying its last items")
+                self._missing = True
+            playlist = {'items': self._items, 'shuffle': self._shuffle}
+        items = [path for path in playlist['items'] if os.path.exists(path)]
+        if items != self._items or playlist['shuffle'] != self._shuffle:
+            # An edited ordered playlist continues after the item that just played
+            self._items, self._shuffle = items, playlist['shuffle']
+            self._order = []
+            if not self._shuffle and self._last_path in items:
+                self._order = items[items.index(self._last_path) + 1:]
+        if not self._order:
+            self._order = list(items)
+            if self._shuffle:
+                random.shuffle(self._order)
+                # No item twice in a row across shuffled cycles
+                if len(self._order) > 1 and self._order[0] == self._last_path:
+                    self._order.append(self._order.pop(0))
+        if not self._order:
+            return None
+        self._last_path = self._order.pop(0)
+        return self._last_path
+
+    def feed(self, process):
+        """Write items into process.stdin until the output process goes away; runs in its own thread"""
+        # Every output process starts its timeline at zero
+        offset = 0.0
+        out = getattr(process.stdin, 'buffer', process.stdin)
+        waiting = False
+        try:
+            while process.poll() is None:
+                path = self.next_item()
+                if not path:
+                    if not waiting:
+                        self.log_callback(f"⏸️ Batch {self.batch_index}: Playlist '{self.name}' has no playable items, waiting")
+                        waiting = True
+                    time.sleep(PLAYLIST_EMPTY_WAIT_SECONDS)
+                    continue
+                waiting = False
+                played = self._play(path, out, offset)
+                if played is None:
+                    break
+                offset += played
+        finally:
+            try:
+                out.close()
+            except OSError:
+                pass
+
+    def _play(self, path, out, offset):
+        # Returns the media time written, or None once the output side is closed
+        probe = (get_media_index().get(path) or {}).get('probe') or {}
+        codec_args = ["-c", "copy"] if media_stream_status(probe) == "📦 stream-ready" else PLAYLIST_ITEM_ENCODE_ARGS
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-re", "-i", path,
+            "-map", "0:v:0", "-map", "0:a:0?", *codec_args,
+            "-output_ts_offset", f"{offset:.3f}", "-f", "mpegts", "pipe:1"
+        ]
+
+        record_playlist_play(self.name, path)
+        self.on_item(path)
+        self.log_callback(f"▶️ Batch {self.batch_index}: Now playing {os.path.basename(path)}")
+        started = time.monotonic()
+        item = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            for chunk in iter(lambda: item.stdout.read1(PLAYLIST_PIPE_CHUNK_BYTES), b""):
+                out.write(chunk)
+            out.flush()
+        except (BrokenPipeError, ValueError, OSError):
+            return None
+        finally:
+            if item.poll() is None:
+                item.kill()
+            item.wait()
+
+        elapsed = time.monotonic() - started
+        if item.returncode != 0:
+            self.log_callback(f"⚠️ Batch {self.batch_index}: Skipping {os.path.basename(path)}, ffmpeg exit code {item.returncode}")
+            # A playlist of broken files must not spin
+            time.sleep(max(0, 1 - elapsed))
+            return elapsed
+        try:
+            return float(probe['format']['duration'])
+        except (KeyError, TypeError, ValueError):
+            return elapsed
+
+def _bitrate_kbps(value):
+    """Convert '2500k' style settings or bit/s probe values to kbps"""
+    value = str(value).strip().lower()
+    if value.endswith('k'):
+        return float(value[:-1])
+    return float(value) / 1000
+
+def check_stream_copy_eligibility(video_path, video_settings, is_shorts=False):
+    """Decide whether a source can be sent to RTMP with -c copy; returns (eligible, reason)"""
+    media = get_media_index().get(video_path)
+    info = media['probe'] if media else None
+    if not info:
+        return False, "ffprobe could not read the source"
+    
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    
+    if not video or video.get('codec_name') != 'h264':
+        return False, f"video codec is {video.get('codec_name') if video else 'missing'}, not h264"
+    if video.get('profile') not in STREAM_COPY_VIDEO_PROFILES:
+        return False, f"h264 profile {video.get('profile')} is not supported"
+    if video.get('pix_fmt') != 'yuv420p':
+        return False, f"pixel format {video.get('pix_fmt')} is not yuv420p"
+    if is_shorts and (video.get('width'), video.get('height')) != (720, 1280):
+        return False, "Shorts mode needs scaling to 720x1280"
+    target_height = RESOLUTION_HEIGHTS.get(video_settings.get('resolution'))
+    if not is_shorts and target_height and video.get('height') != target_height:
+        return False, f"source is {video.get('height')}p, needs scaling to {video_settings['resolution']}"
+    if video_settings.get('custom_parameters'):
+        return False, "custom encoder parameters require encoding"
+    
+    if not audio or audio.get('codec_name') != 'aac':
+        return False, f"audio codec is {audio.get('codec_name') if audio else 'missing'}, not aac"
+    if int(audio.get('sample_rate', 0)) not in STREAM_COPY_AUDIO_RATES:
+        return False, f"audio sample rate {audio.get('sample_rate')} Hz is not 44.1/48 kHz"
+    
+    source_bitrate = info.get('format', {}).get('bit_rate')
+    target_bitrate = _bitrate_kbps(video_settings.get('bitrate', '2500k'))
+    if source_bitrate and _bitrate_kbps(source_bitrate) > target_bitrate * STREAM_COPY_BITRATE_TOLERANCE:
+        return False, f"source bitrate {_bitrate_kbps(source_bitrate):.0f}k is above target {target_bitrate:.0f}k"
+    
+    keyframe_interval = media['keyframe_interval']
+    if keyframe_interval is None:
+        return False, "could not determine keyframe spacing"
+    if keyframe_interval > STREAM_COPY_MAX_KEYFRAME_SECONDS:
+        return False, f"keyframe interval {keyframe_interval:.1f}s exceeds {STREAM_COPY_MAX_KEYFRAME_SECONDS}s"
+    
+    return True, f"h264 {video.get('profile')} / aac {audio.get('sample_rate')} Hz, keyframes every {keyframe_interval:.1f}s"
+
+# Valid encoder options per codec, used to validate profiles before building a command
+ENCODER_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"]
+ENCODER_PROFILES = {
+    "libx264": ["baseline", "main", "high"],
+    "libx265": ["main", "main10"]
+}
+ENCODER_TUNES = {
+    "libx264": ["film", "animation", "grain", "stillimage", "fastdecode", "zerolatency"],
+    "libx265": ["animation", "grain", "fastdecode", "zerolatency"]
+}
+RESOLUTION_HEIGHTS = {"360p": 360, "480p": 480, "720p": 720, "1080p": 1080, "1440p": 1440, "2160p": 2160}
+AUDIO_CHANNELS = {"mono": "1", "stereo": "2"}
+
+# Options that would break the command built around custom parameters
+FORBIDDEN_CUSTOM_OPTIONS = {
+    "-i", "-f", "-y", "-n", "-re", "-t", "-stream_loop", "-progress", "-map",
+    "-c", "-codec", "-c:v", "-c:a", "-vcodec", "-acodec",
+    "-vf", "-filter:v", "-filter_complex", "-lavfi"
+}
+
+def validate_encoder_settings(video_settings):
+    """Validate encoding settings before they reach ffmpeg"""
+    codec = video_settings.get("codec", "libx264")
+    if codec not in ENCODER_PROFILES:
+        return False, f"Unsupported video codec: {codec}"
+    
+    preset = video_settings.get("preset")
+    if preset and preset not in ENCODER_PRESETS:
+        return False, f"Unknown preset: {preset}"
+    
+    profile = video_settings.get("profile")
+    if profile and profile not in ENCODER_PROFILES[codec]:
+        return False, f"Profile '{profile}' is not available for {codec} (use {', '.join(ENCODER_PROFILES[codec])})"
+    
+    tune = video_settings.get("tune")
+    if tune and tune not in ENCODER_TUNES[codec]:
+        return False, f"Tune '{tune}' is not available for {codec} (use {', '.join(ENCODER_TUNES[codec])})"
+    
+    resolution = video_settings.get("resolution")
+    if resolution and resolution not in RESOLUTION_HEIGHTS:
+        return False, f"Unknown resolution: {resolution}"
+    
+    # build_encoder_args and the stream copy check both parse bitrate as '<kbps>k'
+    bitrate = video_settings.get("bitrate")
+    if not re.fullmatch(r"\d+k", str(bitrate or "")):
+        return False, f"Bitrate must look like 2500k, got: {bitrate}"
+    
+    try:
+        fps = int(video_settings.get("fps"))
+    except (TypeError, ValueError):
+        return False, f"Frame rate must be a whole number, got: {video_settings.get('fps')}"
+    if fps <= 0:
+        return False, "Frame rate must be greater than 0"
+    
+    buffer_size = video_settings.get("buffer_size")
+    if buffer_size and not re.fullmatch(r"\d+[kKmM]?", str(buffer_size)):
+        return False, f"Buffer size must look like 2048k, got: {buffer_size}"
+    
+    try:
+        keyframe_interval = int(video_settings.get("keyframe_interval", 2))
+    except (TypeError, ValueError):
+        return False, f"Keyframe interval must be a whole number of seconds, got: {video_settings.get('keyframe_interval')}"
+    if not 1 <= keyframe_interval <= 10:
+        return False, "Keyframe interval must be between 1 and 10 seconds"
+    
+    try:
+        custom_args = shlex.split(video_settings.get("custom_parameters") or "")
+    except ValueError as e:
+        return False, f"Custom parameters could not be parsed: {e}"
+    if custom_args and not custom_args[0].startswith("-"):
+        return False, f"Custom parameters must start with an option, got: {custom_args[0]}"
+    for arg in custom_args:
+        if arg in FORBIDDEN_CUSTOM_OPTIONS:
+            return False, f"Custom parameter {arg} is managed by the app and cannot be overridden"
+    
+    return True, "Valid encoder settings"
+
+def build_scale_filter(video_settings, is_shorts=False):
+    """Scale filter for the target size, or None to keep the source size"""
+    # Shorts mode has a fixed portrait size, otherwise scale to the chosen height
+    if is_shorts:
+        return "scale=720:1280"
+    if video_settings.get("resolution") in RESOLUTION_HEIGHTS:
+        return f"scale=-2:{RESOLUTION_HEIGHTS[video_settings['resolution']]}"
+    return None
+
+def build_encoder_args(video_settings, is_shorts=False, preset=None, scale=True):
+    """Build the video/audio encoding arguments for the given video settings"""
+    codec = video_settings["codec"]
+    fps = int(video_settings["fps"])
+    keyframe_interval = int(video_settings.get("keyframe_interval", 2))
+    bufsize = video_settings.get("buffer_size") or str(int(video_settings["bitrate"].replace('k', '')) * 2) + "k"
+    
+    args = [
+        "-c:v", codec, "-preset", preset or video_settings.get("preset", "veryfast"), 
+        "-b:v", video_settings["bitrate"], "-maxrate", video_settings["bitrate"],
+        "-bufsize", bufsize,
+        "-r", str(fps), "-g", str(fps * keyframe_interval),
+        "-keyint_min", str(fps * keyframe_interval),
+        "-pix_fmt", "yuv420p"
+    ]
+    if video_settings.get("profile"):
+        args.extend(["-profile:v", video_settings["profile"]])
+    if video_settings.get("tune"):
+        args.extend(["-tune", video_settings["tune"]])
+    
+    args.extend(["-c:a", video_settings["audio_codec"], "-b:a", video_settings["audio_bitrate"]])
+    if video_settings.get("audio_channels") in AUDIO_CHANNELS:
+        args.extend(["-ac", AUDIO_CHANNELS[video_settings["audio_channels"]]])
+    
+    scale_filter = build_scale_filter(video_settings, is_shorts) if scale else None
+    if scale_filter:
+        args.extend(["-vf", scale_filter])
+    
+    args.extend(shlex.split(video_settings.get("custom_parameters") or ""))
+    return args
+
+# Audio options and the stream-specifiable form they take when scoped to one rendition
+AUDIO_STREAM_OPTIONS = {"-ar": "-ar:a", "-ac": "-ac:a", "-aq": "-q:a", "-af": "-filter:a"}
+
+def scope_stream_args(args, index):
+    """Scope encoder options to the index-th video/audio stream, e.g. -b:v -> -b:v:1"""
+    scoped = []
+    for arg in args:
+        if not arg.startswith("-") or re.fullmatch(r"-[\d.]+", arg):
+            # Option values pass through unchanged
+            scoped.append(arg)
+        elif re.fullmatch(r"-[\w-]+:[va]", arg):
+            scoped.append(f"{arg}:{index}")
+        elif arg in AUDIO_STREAM_OPTIONS:
+            scoped.append(f"{AUDIO_STREAM_OPTIONS[arg]}:{index}")
+        else:
+            scoped.append(f"{arg}:v:{index}")
+    return scoped
+
+def build_rendition_args(renditions):
+    """Split one decoded input into several scaled and encoded FLV outputs"""
+    # renditions: [{'video_settings', 'is_shorts', 'output_url'}]
+    count = len(renditions)
+    graph = f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))
+    for i, rendition in enumerate(renditions):
+        scale_filter = build_scale_filter(rendition['video_settings'], rendition.get('is_shorts', False))
+        graph += f";[s{i}]{scale_filter or 'null'}[v{i}]"
+    
+    # All renditions go into one tee output, so a failing RTMP endpoint only drops its own slave
+    args = ["-filter_complex", graph]
+    for i in range(count):
+        args.extend(["-map", f"[v{i}]"])
+    for i in range(count):
+        args.extend(["-map", "0:a:0?"])
+    for i, rendition in enumerate(renditions):
+        encoder_args = build_encoder_args(rendition['video_settings'], rendition.get('is_shorts', False), scale=False)
+        args.extend(scope_stream_args(encoder_args, i))
+    args.extend(["-flags", "+global_header", "-f", "tee"])
+    args.append("|".join(
+        f"[select=\\'v:{i},a:{i}\\':f=flv:onfail=ignore]{rendition['output_url']}"
+        for i, rendition in enumerate(renditions)
+    ))
+    return args
+
+def rendition_label(video_settings, is_shorts=False):
+    """Short human label for a rendition, e.g. '1080p @ 4500k'"""
+    size = "Shorts 720x1280" if is_shorts else video_settings.get("resolution", "source")
+    return f"{size} @ {video_settings['bitrate']}"
+
+def save_encoder_profile(name, video_settings):
+    """Save a named encoder profile persistently"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        
+        now = datetime.now().isoformat()
+        cursor.execute('''
+            INSERT INTO encoder_profiles (name, settings, created_at, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET settings = excluded.settings, updated_at = excluded.updated_at
+        ''', (name, json.dumps(video_settings), now, now))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error saving encoder profile: {e}")
+        return False
+
+def load_encoder_profiles():
+    """Load saved encoder profiles as {name: settings}"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT name, settings FROM encoder_profiles ORDER BY name
+        ''')
+        
+        profiles = {name: json.loads(settings) for name, settings in cursor.fetchall()}
+        conn.close()
+        return profiles
+    except Exception as e:
+        st.error(f"Error loading encoder profiles: {e}")
+        return {}
+
+def delete_encoder_profile(name):
+    """Delete a saved encoder profile"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM encoder_profiles WHERE name = ?", (name,))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        st.error(f"Error deleting encoder profile: {e}")
+
+# Encoder capacity planning
+CAPACITY_TARGET_UTILIZATION = 0.85
+COPY_STREAM_CORES = 0.05
+UNBENCHMARKED_STREAM_CORES = 1.0
+BENCHMARK_SECONDS = 10
+
+def benchmark_encoder(sample_path, video_settings, seconds=BENCHMARK_SECONDS):
+    """Encode a short sample on one thread and return the achieved realtime multiple"""
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostats", "-t", str(seconds), "-i", sample_path]
+    cmd.extend(build_encoder_args(video_settings))
+    cmd.extend(["-threads", "1", "-progress", "pipe:1", "-f", "null", "-"])
+    
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-300:] or f"ffmpeg exited with code {result.returncode}")
+    
+    # The last progress block carries the overall speed
+    block, last = {}, None
+    for line in result.stdout.splitlines():
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key == "progress":
+            last, block = parse_ffmpeg_progress(block), {}
+    return last['speed'] if last else None
+
+def save_benchmark_result(video_settings, speed_per_core):
+    """Save one benchmark measurement"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO encoder_benchmarks 
+            (timestamp, host, codec, preset, resolution, fps, bitrate, speed_per_core)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            datetime.now().isoformat(),
+            os.uname().nodename if hasattr(os, "uname") else None,
+            video_settings['codec'],
+            video_settings.get('preset', 'veryfast'),
+            video_settings.get('resolution', '1080p'),
+            str(video_settings['fps']),
+            video_settings.get('bitrate'),
+            speed_per_core
+        ))
+        
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log_to_database(None, "ERROR", f"Error saving benchmark result: {e}")
+
+def load_benchmark_results():
+    """Latest benchmark per codec/preset/resolution/fps combination"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT codec, preset, resolution, fps, speed_per_core, timestamp
+            FROM encoder_benchmarks
+            WHERE id IN (
+                SELECT MAX(id) FROM encoder_benchmarks
+                GROUP BY codec, preset, resolution, fps
+            )
+            ORDER BY codec, resolution, fps, preset
+        ''')
+        
+        results = cursor.fetchall()
+        conn.close()
+        return results
+    except Exception:
+        return []
+
+def estimate_stream_cores(video_settings, use_copy=False):
+    """CPU cores one stream needs, from benchmarks; returns (cores, benchmarked)"""
+    if use_copy:
+        return COPY_STREAM_CORES, True
+    for codec, preset, resolution, fps, speed_per_core, _ in load_benchmark_results():
+        if (codec, preset, resolution, fps) == (
+            video_settings['codec'],
+            video_settings.get('preset', 'veryfast'),
+            video_settings.get('resolution', '1080p'),
+            str(video_settings['fps'])
+        ) and speed_per_core:
+            return 1 / speed_per_core, True
+    return UNBENCHMARKED_STREAM_CORES, False
+
+def plan_batch_capacity(stream_costs, current_cores=0):
+    """Compare the cores a batch mix needs with what the host can sustain"""
+    total_cores = os.cpu_count() or 1
+    available = total_cores * CAPACITY_TARGET_UTILIZATION - current_cores
+    required = sum(cores for cores, _ in stream_costs)
+    return {
+        'total_cores': total_cores,
+        'current_cores': current_cores,
+        'required_cores': required,
+        'available_cores': available,
+        'unbenchmarked': sum(1 for _, benchmarked in stream_costs if not benchmarked),
+        'fits': required <= available
+    }
+
+class BenchmarkRunner:
+    """Runs benchmark combinations in the background so the UI stays responsive"""
+
+    def __init__(self):
+        self.status = {'running': False, 'done': 0, 'total': 0, 'current': None, 'errors': []}
+        self._lock = threading.Lock()
+
+    def start(self, sample_path, base_settings, presets, resolutions, fps_values):
+        with self._lock:
+            if self.status['running']:
+                return False
+            combos = [(p, r, f) for p in presets for r in resolutions for f in fps_values]
+            self.status = {'running': True, 'done': 0, 'total': len(combos), 'current': None, 'errors': []}
+        threading.Thread(target=self._run, args=(sample_path, base_settings, combos), name="encoder-benchmark", daemon=True).start()
+        return True
+
+    def _run(self, sample_path, base_settings, combos):
+        for preset, resolution, fps in combos:
+            settings = {**base_settings, 'preset': preset, 'resolution': resolution, 'fps': fps, 'custom_parameters': ""}
+            self.status['current'] = f"{preset} / {resolution} / {fps}fps"
+            try:
+                speed = benchmark_encoder(sample_path, settings)
+                if speed:
+                    save_benchmark_result(settings, speed)
+            except Exception as e:
+                self.status['errors'].append(f"{self.status['current']}: {e}")
+            self.status['done'] += 1
+        self.status['running'] = False
+        self.status['current'] = None
+
+@st.cache_resource
+def get_benchmark_runner():
+    """Process-wide benchmark runner"""
+    return BenchmarkRunner()
+
+# Pre-transcode cache: encode a source once into a stream-ready file
+TRANSCODE_CACHE_DIR = "transcode_cache"
+TRANSCODE_CACHE_MAX_BYTES = 20 * 1024 ** 3
+TRANSCODE_CACHE_PRESET = "medium"
+
+# Settings that change how a stream is sent but not what gets encoded
+_NON_ENCODING_SETTINGS = {"copy_mode", "transcode_cache"}
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TranscodeCache:
+    """Builds stream-ready copies of sources in the background with size-based LRU eviction"""
+
+    def __init__(self, cache_dir=TRANSCODE_CACHE_DIR, max_bytes=TRANSCODE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
+        self.jobs = queue.Queue()
+        self._pending = set()
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="transcode-cache", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _settings_key(video_settings):
+        encoding = {k: v for k, v in video_settings.items() if k not in _NON_ENCODING_SETTINGS}
+        return json.dumps(encoding, sort_keys=True)
+
+    def _cache_key(self, source_hash, video_settings, is_shorts):
+        raw = f"{source_hash}|{self._settings_key(video_settings)}|{bool(is_shorts)}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def lookup(self, video_path, video_settings, is_shorts=False):
+        """Path of a ready cached artifact, or None; never hashes on the caller's thread"""
+        try:
+            source_hash = get_media_index().cached_hash(video_path)
+            if not source_hash:
+                return None
+            cache_key = self._cache_key(source_hash, video_settings, is_shorts)
+            
+            conn = sqlite3.connect(LOG_DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT output_path FROM transcode_cache
+                WHERE cache_key = ? AND status = 'ready'
+            ''', (cache_key,))
+            row = cursor.fetchone()
+            if row and os.path.exists(row[0]):
+                cursor.execute('''
+                    UPDATE transcode_cache SET last_used = ? WHERE cache_key = ?
+                ''', (datetime.now().isoformat(), cache_key))
+                conn.commit()
+                conn.close()
+                return row[0]
+            conn.close()
+            return None
+        except Exception:
+            return None
+
+    def schedule(self, video_path, video_settings, is_shorts=False):
+        """Queue a background transcode for this source and settings if not already queued"""
+        job_id = (os.path.abspath(video_path), self._settings_key(video_settings), bool(is_shorts))
+        with self._lock:
+            if job_id in self._pending:
+                return
+            self._pending.add(job_id)
+        self.jobs.put((job_id, video_path, dict(video_settings), is_shorts))
+
+    def acquire(self, path):
+        """Keep an artifact from being evicted while a stream, including its reconnects, reads it"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+
+    def release(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._in_use.pop(path, 0) - 1
+            if count > 0:
+                self._in_use[path] = count
+
+    def stats(self):
+        """Cache size and queue depth for the UI"""
+        try:
+            conn = sqlite3.connect(LOG_DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM transcode_cache WHERE status = 'ready'
+            ''')
+            entries, size_bytes = cursor.fetchone()
+            conn.close()
+        except Exception:
+            entries, size_bytes = 0, 0
+        return {'entries': entries, 'size_bytes': size_bytes, 'pending': len(self._pending)}
+
+    def _run(self):
+        while True:
+            job_id, video_path, video_settings, is_shorts = self.jobs.get()
+            try:
+                self._build(video_path, video_settings, is_shorts)
+            except Exception as e:
+                log_to_database(None, "ERROR", f"Transcode cache failed for {video_path}: {e}", video_path)
+            finally:
+                with self._lock:
+                    self._pending.discard(job_id)
+
+    def _build(self, video_path, video_settings, is_shorts):
+        source_hash = get_media_index().content_hash(video_path)
+        
+        cache_key = self._cache_key(source_hash, video_settings, is_shorts)
+        output_path = self.cache_dir / f"{cache_key}.mp4"
+        
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM transcode_cache WHERE cache_key = ?", (cache_key,))
+        row = cursor.fetchone()
+        if row and row[0] == 'ready' and output_path.exists():
+            conn.close()
+            return
+        
+        now = datetime.now().isoformat()
+        cursor.execute('''
+            INSERT OR REPLACE INTO transcode_cache 
+            (cache_key, source_hash, source_path, settings, is_shorts, output_path, status, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, 'building', ?, ?)
+        ''', (cache_key, source_hash, video_path, self._settings_key(video_settings), is_shorts, str(output_path), now, now))
+        conn.commit()
+        
+        # Encode to a temp name and rename so a half-written file is never streamed
+        temp_path = output_path.with_suffix(".part.mp4")
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", video_path]
+        cmd.extend(build_encoder_args(video_settings, is_shorts, preset=TRANSCODE_CACHE_PRESET))
+        cmd.extend(["-ar", "48000", "-movflags", "+faststart", "-f", "mp4", str(temp_path)])
+        
+        log_to_database(None, "INFO", f"Transcode cache: building {output_path.name} from {video_path}", video_path)
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        # Lower priority after spawning: preexec_fn can deadlock in a multi-threaded process
+        if hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, process.pid, 10)
+            except OSError:
+                pass
+        _, stderr = process.communicate()
+        
+        if process.returncode == 0 and temp_path.exists():
+            os.replace(temp_path, output_path)
+            cursor.execute('''
+                UPDATE transcode_cache SET status = 'ready', size_bytes = ? WHERE cache_key = ?
+            ''', (output_path.stat().st_size, cache_key))
+            log_to_database(None, "INFO", f"Transcode cache: {output_path.name} ready", video_path)
+        else:
+            if temp_path.exists():
+                temp_path.unlink()
+            cursor.execute("UPDATE transcode_cache SET status = 'failed' WHERE cache_key = ?", (cache_key,))
+            log_to_database(None, "ERROR", f"Transcode cache: ffmpeg failed for {video_path}: {stderr.strip()[-500:]}", video_path)
+        conn.commit()
+        conn.close()
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used artifacts until the cache fits in max_bytes, sparing ones in use"""
+        with self._lock:
+            in_use = set(self._in_use)
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT cache_key, output_path, size_bytes FROM transcode_cache
+            WHERE status = 'ready'
+            ORDER BY last_used DESC
+        ''')
+        total = 0
+        for cache_key, output_path, size_bytes in cursor.fetchall():
+            total += size_bytes or 0
+            if total > self.max_bytes and os.path.abspath(output_path) not in in_use:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                cursor.execute("DELETE FROM transcode_cache WHERE cache_key = ?", (cache_key,))
+        conn.commit()
+        conn.close()
+
+@st.cache_resource
+def get_transcode_cache():
+    """Process-wide transcode cache shared by all sessions"""
+    return TranscodeCache()
+
+def resolve_stream_source(video_path, video_settings, is_shorts=False):
+    """Pick what to stream and how: returns (path, use_copy, reason)"""
+    copy_mode = video_settings.get("copy_mode", "auto")
+    if copy_mode == "encode":
+        return video_path, False, "stream copy disabled"
+    if copy_mode == "copy":
+        return video_path, True, "decided before launch"
+    
+    eligible, reason = check_stream_copy_eligibility(video_path, video_settings, is_shorts)
+    if eligible:
+        return video_path, True, reason
+    
+    if video_settings.get("transcode_cache", True):
+        cache = get_transcode_cache()
+        cached_path = cache.lookup(video_path, video_settings, is_shorts)
+        if cached_path:
+            return cached_path, True, f"pre-transcoded cache ({reason})"
+        cache.schedule(video_path, video_settings, is_shorts)
+        reason = f"{reason}; pre-transcode queued"
+    return video_path, False, reason
+
+# Graceful ffmpeg shutdown: SIGINT, then SIGTERM, then SIGKILL
+FFMPEG_STOP_TIMEOUT = 10
+FFMPEG_REAP_AFTER_SECONDS = 3600
+
+class StreamSupervisor:
+    """Owns every ffmpeg child per (session, batch) so one batch can be stopped without touching others"""
+
+    def __init__(self):
+        self._procs = {}
+        self._lock = threading.Lock()
+
+    def register(self, owner, batch_key, process, relaunch=False, **info):
+        """Track a freshly started ffmpeg process; returns True if the batch is already stopped
+
+        A relaunch keeps the stop flag of the process it replaces, so a stop that
+        arrives while a batch reconnects is not lost.
+        """
+        with self._lock:
+            previous = self._procs.get((owner, batch_key))
+            stop_requested = bool(relaunch and previous and previous['stop_requested'])
+            self._procs[(owner, batch_key)] = {
+                'process': process,
+                'started': datetime.now(),
+                'ended': None,
+                'stop_requested': stop_requested,
+                **info
+            }
+        return stop_requested
+
+    def get(self, owner, batch_key):
+        with self._lock:
+            return self._procs.get((owner, batch_key))
+
+    def stop_requested(self, owner, batch_key):
+        entry = self.get(owner, batch_key)
+        return bool(entry and entry['stop_requested'])
+
+    def wait_for_stop(self, owner, batch_key, seconds):
+        """Sleep between restarts, returning True early if the batch gets stopped"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self.stop_requested(owner, batch_key):
+                return True
+            time.sleep(min(0.5, max(0, deadline - time.monotonic())))
+        return self.stop_requested(owner, batch_key)
+
+    def stop(self, owner, batch_key, timeout=FFMPEG_STOP_TIMEOUT):
+        """Stop one batch: SIGINT so ffmpeg writes a clean FLV trailer, escalating if it hangs"""
+        entry = self.get(owner, batch_key)
+        if not entry:
+            return None
+        entry['stop_requested'] = True
+        process = entry['process']
+        
+        for sig, wait in ((signal.SIGINT, timeout), (signal.SIGTERM, timeout / 2), (signal.SIGKILL, None)):
+            if process.poll() is not None:
+                break
+            try:
+                process.send_signal(sig)
+                process.wait(timeout=wait)
+            except subprocess.TimeoutExpired:
+                continue
+            except ProcessLookupError:
+                break
+        entry['ended'] = entry['ended'] or datetime.now()
+        return process.returncode
+
+    def restart(self, owner, batch_key, timeout=FFMPEG_STOP_TIMEOUT):
+        """End the current ffmpeg of a batch without stopping the batch, so its restart policy reconnects"""
+        entry = self.get(owner, batch_key)
+        if not entry or entry['stop_requested']:
+            return None
+        process = entry['process']
+        for sig, wait in ((signal.SIGTERM, timeout), (signal.SIGKILL, None)):
+            if process.poll() is not None:
+                break
+            try:
+                process.send_signal(sig)
+                process.wait(timeout=wait)
+            except subprocess.TimeoutExpired:
+                continue
+            except ProcessLookupError:
+                break
+        return process.returncode
+
+    def stop_all(self, timeout=FFMPEG_STOP_TIMEOUT):
+        """Stop every tracked batch of every session in parallel, e.g. on shutdown; returns {(owner, batch_key): exit code}"""
+        with self._lock:
+            keys = list(self._procs)
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            results = executor.map(lambda key: self.stop(*key, timeout=timeout), keys)
+            return dict(zip(keys, results))
+
+    def stop_session(self, owner, batch_keys=None, timeout=FFMPEG_STOP_TIMEOUT):
+        """Stop several batches of one session in parallel; returns {batch_key: exit code}"""
+        with self._lock:
+            keys = [key for (o, key) in self._procs if o == owner and (batch_keys is None or key in batch_keys)]
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            results = executor.map(lambda key: self.stop(owner, key, timeout), keys)
+            return dict(zip(keys, results))
+
+    def status(self, owner):
+        """Per-batch PID, running state and exit code for one session"""
+        self.reap()
+        with self._lock:
+            entries = [(key, entry) for (o, key), entry in self._procs.items() if o == owner]
+        return [
+            {
+                'batch_key': key,
+                'pid': entry['process'].pid,
+                'running': entry['process'].returncode is None,
+                'returncode': entry['process'].returncode,
+                'stop_requested': entry['stop_requested'],
+                'started': entry['started']
+            }
+            for key, entry in sorted(entries)
+        ]
+
+    def reap(self):
+        """Collect exited children and forget ones that finished long ago"""
+        now = datetime.now()
+        with self._lock:
+            for key, entry in list(self._procs.items()):
+                if entry['process'].poll() is None:
+                    continue
+                entry['ended'] = entry['ended'] or now
+                if (now - entry['ended']).total_seconds() > FFMPEG_REAP_AFTER_SECONDS:
+                    del self._procs[key]
+
+@st.cache_resource
+def get_stream_supervisor():
+    """Process-wide ffmpeg supervisor shared by all sessions"""
+    return StreamSupervisor()
+
+# Automatic reconnect for dropped RTMP sessions
+RESTART_MAX_RETRIES = 20
+RESTART_BASE_DELAY = 2
+RESTART_MAX_DELAY = 60
+RESTART_JITTER = 0.3
+RESTART_STABLE_SECONDS = 120
+RESTART_BREAKER_FAILURES = 5
+RESTART_BREAKER_WINDOW = 300
+RESTART_BREAKER_COOLDOWN = 600
+
+# stderr patterns that mean the ingest connection failed rather than the input
+FFMPEG_NETWORK_ERRORS = re.compile(
+    r"broken pipe|connection (reset|refused|timed out)|network is unreachable|"
+    r"i/o error|end of file|rtmp_|handshake|failed to (connect|update header)|error writing trailer|"
+    r"server returned|host is unreachable|timed out",
+    re.IGNORECASE
+)
+# stderr patterns where retrying cannot help; a bare "Invalid argument" also follows RTMP/TCP resets
+FFMPEG_FATAL_ERRORS = re.compile(
+    r"no such file or directory|invalid data found|unknown encoder|permission denied|"
+    r"unrecognized option|error setting option|error parsing options|option \S+ not found",
+    re.IGNORECASE
+)
+
+class RestartPolicy:
+    """Exponential backoff with jitter and a circuit breaker for one batch"""
+
+    def __init__(self, max_retries=RESTART_MAX_RETRIES, base_delay=RESTART_BASE_DELAY, max_delay=RESTART_MAX_DELAY,
+                 jitter=RESTART_JITTER, stable_seconds=RESTART_STABLE_SECONDS, breaker_failures=RESTART_BREAKER_FAILURES,
+                 breaker_window=RESTART_BREAKER_WINDOW, breaker_cooldown=RESTART_BREAKER_COOLDOWN):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.stable_seconds = stable_seconds
+        self.breaker_failures = breaker_failures
+        self.breaker_window = breaker_window
+        self.breaker_cooldown = breaker_cooldown
+        self.attempt = 0
+        self.failures = deque()
+
+    def next_delay(self, uptime):
+        """Seconds to wait before the next attempt, or None to give up"""
+        now = time.monotonic()
+        # A run that stayed up for a while resets the backoff
+        if uptime >= self.stable_seconds:
+            self.attempt = 0
+        self.attempt += 1
+        if self.attempt > self.max_retries:
+            return None
+        
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.breaker_window:
+            self.failures.popleft()
+        if len(self.failures) >= self.breaker_failures:
+            # Circuit open: too many failures in the window, back off hard
+            self.failures.clear()
+            return self.breaker_cooldown
+        
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.attempt - 1))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+def classify_ffmpeg_exit(returncode, stderr_tail, stop_requested=False, deadline_reached=False):
+    """Classify why ffmpeg exited: stopped, completed, fatal or network"""
+    if stop_requested:
+        return "stopped"
+    if returncode == 0 and deadline_reached:
+        return "completed"
+    text = "\n".join(stderr_tail)
+    if FFMPEG_FATAL_ERRORS.search(text):
+        return "fatal"
+    if returncode == 0 or FFMPEG_NETWORK_ERRORS.search(text):
+        # A looping stream has no natural end, so a clean exit means the server hung up
+        return "network"
+    return "crash"
+
+def record_stream_restart(session_id, batch_index, attempt, reason, exit_code, downtime_seconds):
+    """Queue a restart record for the background database writer"""
+    get_log_writer().submit('''
+        INSERT INTO stream_restarts 
+        (timestamp, session_id, batch_index, attempt, reason, exit_code, downtime_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        datetime.now().isoformat(),
+        session_id,
+        batch_index,
+        attempt,
+        reason,
+        exit_code,
+        downtime_seconds
+    ))
+
+def get_restart_summary(session_id):
+    """Restart count and total downtime per batch for a session"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT batch_index, COUNT(*), COALESCE(SUM(downtime_seconds), 0)
+            FROM stream_restarts
+            WHERE session_id = ?
+            GROUP BY batch_index
+            ORDER BY batch_index
+        ''', (session_id,))
+        
+        summary = cursor.fetchall()
+        conn.close()
+        return summary
+    except Exception as e:
+        st.error(f"Error getting restart summary: {e}")
+        return []
+
+def _progress_number(value, suffix="", cast=float):
+    """Convert an ffmpeg progress value like '2500.1kbits/s' or 'N/A' to a number"""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+def parse_ffmpeg_progress(block):
+    """Turn one `-progress` key=value block into numeric encoder metrics"""
+    # out_time_ms is actually reported in microseconds by ffmpeg, prefer out_time_us
+    out_time_us = _progress_number(block.get('out_time_us', block.get('out_time_ms', '')), cast=int)
+    return {
+        'frame': _progress_number(block.get('frame', ''), cast=int),
+        'fps': _progress_number(block.get('fps', '')),
+        'bitrate_kbps': _progress_number(block.get('bitrate', ''), "kbits/s"),
+        'speed': _progress_number(block.get('speed', ''), "x"),
+        'drop_frames': _progress_number(block.get('drop_frames', ''), cast=int),
+        'dup_frames': _progress_number(block.get('dup_frames', ''), cast=int),
+        'out_time_ms': out_time_us // 1000 if out_time_us is not None else None,
+        'progress': block.get('progress')
+    }
+
+def format_stream_metrics(metrics):
+    """Short human readable summary of parsed encoder metrics"""
+    def show(value, fmt):
+        return fmt.format(value) if value is not None else "N/A"
+    return (
+        f"frame={show(metrics.get('frame'), '{}')} "
+        f"fps={show(metrics.get('fps'), '{:.1f}')} "
+        f"bitrate={show(metrics.get('bitrate_kbps'), '{:.0f}kbps')} "
+        f"speed={show(metrics.get('speed'), '{:.2f}x')} "
+        f"drop={show(metrics.get('drop_frames'), '{}')} "
+        f"dup={show(metrics.get('dup_frames'), '{}')}"
+    )
+
+def _drain_ffmpeg_stderr(stream, log_callback, session_id, video_path, batch_index, tail=None):
+    """Persist ffmpeg warnings and errors; progress is read separately from stdout"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if tail is not None:
+            tail.append(line)
+        log_callback(f"Batch {batch_index}: {line}")
+        if session_id:
+            log_type = "ERROR" if "error" in line.lower() else "FFMPEG"
+            log_to_database(session_id, log_type, f"Batch {batch_index}: {line}", video_path)
+
+def _run_ffmpeg_once(cmd, log_callback, session_id, video_path, batch_index, playlist=None, relaunch=False):
+    """Run one ffmpeg process to completion; returns (exit code, stderr tail)"""
+    stdin = subprocess.PIPE if playlist else subprocess.DEVNULL
+    process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    owner, batch_key = session_id or "default", f"batch_{batch_index}"
+    log_callback(f"🆔 Batch {batch_index}: FFmpeg PID {process.pid}")
+    if get_stream_supervisor().register(owner, batch_key, process, relaunch=relaunch, video_path=video_path):
+        # Stopped while reconnecting: end the relaunched ffmpeg before it goes live
+        get_stream_supervisor().stop(owner, batch_key)
+    elif playlist:
+        threading.Thread(target=playlist.feed, args=(process,), name=f"playlist-batch_{batch_index}", daemon=True).start()
+    stderr_tail = deque(maxlen=20)
+    stderr_thread = threading.Thread(
+        target=_drain_ffmpeg_stderr,
+        args=(process.stderr, log_callback, session_id, video_path, batch_index, stderr_tail),
+        daemon=True
+    )
+    stderr_thread.start()
+    
+    block = {}
+    last_sample = 0
+    for line in process.stdout:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key != "progress":
+            continue
+        
+        # A "progress" key closes each key=value block
+        metrics = parse_ffmpeg_progress(block)
+        block = {}
+        now = time.monotonic()
+        if now - last_sample >= METRICS_SAMPLE_SECONDS or metrics['progress'] == "end":
+            last_sample = now
+            log_callback(f"Batch {batch_index}: {format_stream_metrics(metrics)}")
+            if session_id:
+                save_stream_metrics(session_id, batch_index, metrics)
+    process.wait()
+    stderr_thread.join(timeout=5)
+    return process.returncode, list(stderr_tail)
+
+def run_ffmpeg(video_path, stream_key, is_shorts, log_callback, rtmp_url=None, session_id=None, duration_limit=None, video_settings=None, batch_index=0, restart_policy=None, output_urls=None, renditions=None, playlist=None):
+    """Run FFmpeg for streaming with optional duration limit and custom video settings.
+    
+    Returns how the stream ended: completed, stopped, fatal, network or crash.
+    With a PlaylistFeeder the input is an MPEG-TS stream on stdin instead of a looped file.
+    """
+    # Several outputs share one decode/encode through the tee muxer
+    output_urls = output_urls or [rtmp_url or f"rtmp://a.rtmp.youtube.com/live2/{stream_key}"]
+    
+    # Default video settings
+    if video_settings is None:
+        video_settings = dict(DEFAULT_VIDEO_SETTINGS)
+    
+    # Decide between stream copy, a cached pre-transcode and live re-encoding
+    if renditions:
+        # Every rendition is encoded from the original source in the same process
+        stream_path, use_copy, copy_reason = video_path, False, "rendition ladder"
+    elif playlist:
+        stream_path, use_copy, copy_reason = video_path, False, f"playlist '{playlist.name}'"
+    else:
+        stream_path, use_copy, copy_reason = resolve_stream_source(video_path, video_settings, is_shorts)
+    
+    if playlist:
+        # Items follow each other on one input, so the RTMP session survives every transition
+        log_callback(f"📃 Batch {batch_index}: Playlist '{playlist.name}' into one persistent output")
+        cmd = ["ffmpeg", "-fflags", "+genpts", "-f", "mpegts", "-i", "pipe:0"]
+        cmd.extend(build_encoder_args(video_settings, is_shorts))
+        cmd.extend(["-af", "aresample=async=1"])
+    elif renditions:
+        labels = ", ".join(rendition_label(r['video_settings'], r.get('is_shorts', False)) for r in renditions)
+        log_callback(f"🪜 Batch {batch_index}: One decode, {len(renditions)} renditions: {labels}")
+        cmd = ["ffmpeg", "-re", "-stream_loop", "-1", "-i", stream_path]
+    elif use_copy:
+        log_callback(f"📦 Batch {batch_index}: Stream copy (no re-encode): {copy_reason}")
+        cmd = [
+            "ffmpeg", "-re", "-stream_loop", "-1", "-i", stream_path,
+            "-c", "copy"
+        ]
+    else:
+        log_callback(f"🎛️ Batch {batch_index}: Encoding with {video_settings['codec']}: {copy_reason}")
+        
+        # Build FFmpeg command with custom settings
+        cmd = ["ffmpeg", "-re", "-stream_loop", "-1", "-i", stream_path]
+        cmd.extend(build_encoder_args(video_settings, is_shorts))
+    
+    # Structured progress on stdout, only warnings and errors on stderr
+    cmd.extend(["-hide_banner", "-loglevel", "warning", "-nostats", "-progress", "pipe:1"])
+    
+    if renditions:
+        cmd.extend(build_rendition_args(renditions))
+    elif len(output_urls) > 1:
+        # One failing RTMP output must not take the others down
+        log_callback(f"🔀 Batch {batch_index}: Fanning out one encode to {len(output_urls)} outputs")
+        cmd.extend(["-map", "0:v:0", "-map", "0:a:0?", "-flags", "+global_header", "-f", "tee"])
+        cmd.append("|".join(f"[f=flv:onfail=ignore]{url}" for url in output_urls))
+    else:
+        cmd.extend(["-f", "flv", output_urls[0]])
+    
+    start_msg = f"🚀 Batch {batch_index}: Starting FFmpeg with settings: {' '.join(cmd[:8])}... [RTMP URL hidden for security]"
+    log_callback(start_msg)
+    if session_id:
+        log_to_database(session_id, "INFO", f"Batch {batch_index}: {start_msg}", video_path)
+    
+    owner, batch_key = session_id or "default", f"batch_{batch_index}"
+    policy = restart_policy or RestartPolicy()
+    deadline = time.monotonic() + duration_limit if duration_limit else None
+    restarts = 0
+    down_since = None
+    last_exit = None
+    outcome = None
+    
+    # A 24/7 stream holds the oldest last_used, so its artifact is pinned until the stream ends
+    cache = get_transcode_cache() if use_copy and os.path.dirname(os.path.abspath(stream_path)) == os.path.abspath(TRANSCODE_CACHE_DIR) else None
+    if cache:
+        cache.acquire(stream_path)
+    try:
+        while True:
+            # The duration limit is an overall deadline, so restarts only get what is left
+            run_cmd = cmd
+            if deadline:
+                remaining = int(deadline - time.monotonic())
+                if remaining <= 0:
+                    outcome = "completed"
+                    break
+                run_cmd = cmd[:1] + ["-t", str(remaining)] + cmd[1:]
+            
+            started = time.monotonic()
+            if down_since is not None:
+                downtime = started - down_since
+                record_stream_restart(session_id, batch_index, restarts, last_exit[0], last_exit[1], downtime)
+                log_callback(f"🔁 Batch {batch_index}: Restart #{restarts} after {downtime:.1f}s downtime")
+            returncode, stderr_tail = _run_ffmpeg_once(run_cmd, log_callback, session_id, video_path, batch_index, playlist, relaunch=restarts > 0)
+            uptime = time.monotonic() - started
+            
+            outcome = classify_ffmpeg_exit(
+                returncode,
+                stderr_tail,
+                stop_requested=get_stream_supervisor().stop_requested(owner, batch_key),
+                deadline_reached=bool(deadline) and time.monotonic() >= deadline - 1
+            )
+            
+            if outcome == "completed":
+                end_msg = f"✅ Batch {batch_index}: Streaming completed successfully"
+            elif outcome == "stopped":
+                end_msg = f"⏹️ Batch {batch_index}: Stopped by user (exit code {returncode})"
+            elif outcome == "fatal":
+                end_msg = f"❌ Batch {batch_index}: FFmpeg failed with code {returncode}, not retrying: {stderr_tail[-1] if stderr_tail else 'no output'}"
+            else:
+                delay = policy.next_delay(uptime)
+                if delay is None:
+                    end_msg = f"❌ Batch {batch_index}: Giving up after {restarts} restarts ({outcome}, exit code {returncode})"
+                else:
+                    retry_msg = f"⚠️ Batch {batch_index}: FFmpeg exited ({outcome}, exit code {returncode}) after {uptime:.0f}s, reconnecting in {delay:.1f}s"
+                    log_callback(retry_msg)
+                    if session_id:
+                        log_to_database(session_id, "ERROR", retry_msg, video_path)
+                    down_since = time.monotonic()
+                    last_exit = (outcome, returncode)
+                    restarts += 1
+                    if get_stream_supervisor().wait_for_stop(owner, batch_key, delay):
+                        outcome = "stopped"
+                        end_msg = f"⏹️ Batch {batch_index}: Stopped by user while reconnecting"
+                    else:
+                        continue
+            
+            log_callback(end_msg)
+            if session_id:
+                log_to_database(session_id, "INFO" if outcome in ("completed", "stopped") else "ERROR", f"Batch {batch_index}: {end_msg}", video_path)
+            break
+            
+    except Exception as e:
+        outcome = "crash"
         error_msg = f"❌ Batch {batch_index}: FFmpeg Error: {e}"
         log_callback(error_msg)
         if session_id:
             log_to_database(session_id, "ERROR", f"Batch {batch_index}: {error_msg}", video_path)
     finally:
+        if cache:
+            cache.release(stream_path)
         final_msg = f"⏹️ Batch {batch_index}: Streaming session ended"
         log_callback(final_msg)
         if session_id:
             log_to_database(session_id, "INFO", f"Batch {batch_index}: {final_msg}", video_path)
+    return outcome
 
 def auto_process_auth_code():
     """Automatically process authorization code from URL"""
@@ -908,6 +3305,7 @@ def auto_process_auth_code():
                                     channel['id'],
                                     creds_dict
                                 )
+                                get_youtube_registry().assign_channel(service, channel['id'])
                                 
                                 st.success(f"✅ Successfully connected to: {channel['snippet']['title']}")
                                 
@@ -921,123 +3319,1292 @@ def auto_process_auth_code():
             else:
                 st.error("❌ OAuth configuration not found. Please upload OAuth JSON first.")
 
-def get_youtube_categories():
-    """Get YouTube video categories"""
-    return {
-        "1": "Film & Animation",
-        "2": "Autos & Vehicles", 
-        "10": "Music",
-        "15": "Pets & Animals",
-        "17": "Sports",
-        "19": "Travel & Events",
-        "20": "Gaming",
-        "22": "People & Blogs",
-        "23": "Comedy",
-        "24": "Entertainment",
-        "25": "News & Politics",
-        "26": "Howto & Style",
-        "27": "Education",
-        "28": "Science & Technology"
-    }
+def get_youtube_categories():
+    """Get YouTube video categories"""
+    return {
+        "1": "Film & Animation",
+        "2": "Autos & Vehicles", 
+        "10": "Music",
+        "15": "Pets & Animals",
+        "17": "Sports",
+        "19": "Travel & Events",
+        "20": "Gaming",
+        "22": "People & Blogs",
+        "23": "Comedy",
+        "24": "Entertainment",
+        "25": "News & Politics",
+        "26": "Howto & Style",
+        "27": "Education",
+        "28": "Science & Technology"
+    }
+
+# Fungsi untuk auto start streaming
+def auto_start_streaming(video_path, stream_key, is_shorts=False, custom_rtmp=None, session_id=None, duration_limit=None, video_settings=None, batch_index=0, playlist=None):
+    """Auto start streaming dengan konfigurasi default"""
+    if not video_path or not stream_key:
+        st.error("❌ Video atau stream key tidak ditemukan!")
+        return False
+    
+    # Serahkan ke streaming engine, yang berjalan terpisah dari sesi Streamlit
+    result = get_engine().start_stream({
+        'video_path': video_path,
+        'stream_key': stream_key,
+        'is_shorts': is_shorts,
+        'rtmp_url': custom_rtmp or None,
+        'session_id': session_id,
+        'duration_limit': duration_limit,
+        'video_settings': video_settings,
+        'batch_index': batch_index,
+        'playlist': playlist
+    })
+    if not result or 'error' in result:
+        st.error(f"❌ Batch {batch_index}: Streaming engine error: {(result or {}).get('error', 'no response')}")
+        return False
+    
+    # Log ke database
+    log_to_database(session_id, "INFO", f"Batch {batch_index}: Auto streaming started: {video_path}")
+    return True
+
+# Fungsi untuk auto create live broadcast dengan setting manual/otomatis
+def auto_create_live_broadcast(service, use_custom_settings=True, custom_settings=None, session_id=None, batch_index=0):
+    """Auto create live broadcast dengan setting manual atau otomatis"""
+    try:
+        with st.spinner(f"Creating auto YouTube Live broadcast for batch {batch_index}..."):
+            # Schedule for immediate start
+            scheduled_time = datetime.now() + timedelta(seconds=30)
+            
+            # Default settings
+            default_settings = {
+                'title': f"Live Stream - Batch {batch_index}",
+                'description': f"Live streaming session - Batch {batch_index}",
+                'tags': [],
+                'category_id': "20",  # Gaming
+                'privacy_status': "public",
+                'made_for_kids': False
+            }
+            
+            # Gunakan setting custom jika tersedia
+            if use_custom_settings and custom_settings:
+                settings = custom_settings
+            else:
+                settings = default_settings
+            
+            live_info = create_live_stream(
+                service, 
+                settings['title'],
+                settings['description'],
+                scheduled_time,
+                settings['tags'],
+                settings['category_id'],
+                settings['privacy_status'],
+                settings['made_for_kids']
+            )
+            
+            if live_info:
+                if 'batch_live_info' not in st.session_state:
+                    st.session_state['batch_live_info'] = {}
+                st.session_state['batch_live_info'][f"batch_{batch_index}"] = live_info
+                st.success(f"🎉 Batch {batch_index}: Auto YouTube Live Broadcast Created Successfully!")
+                log_to_database(session_id, "INFO", f"Batch {batch_index}: Auto YouTube Live created: {live_info['watch_url']}")
+                return live_info
+            else:
+                st.error(f"❌ Batch {batch_index}: Failed to create auto live broadcast")
+                return None
+    except Exception as e:
+        error_msg = f"Batch {batch_index}: Error creating auto YouTube Live: {e}"
+        st.error(error_msg)
+        log_to_database(session_id, "ERROR", error_msg)
+        return None
+
+# Streaming engine: owns ffmpeg processes and live logs outside the Streamlit rerun loop
+ENGINE_URL = os.environ.get("STREAM_ENGINE_URL")
+ENGINE_HOST = "127.0.0.1"
+ENGINE_PORT = 8765
+ENGINE_LOG_LINES = 100
+ENGINE_TIMEOUT = 10
+# Finished streams stay visible (status, logs) this long before the engine forgets them
+ENGINE_STREAM_RETENTION_SECONDS = FFMPEG_REAP_AFTER_SECONDS
+LIVE_LOG_REFRESH_SECONDS = 2
+
+class LogRing:
+    """Fixed-capacity, thread-safe log buffer with monotonic sequence numbers"""
+
+    def __init__(self, capacity=ENGINE_LOG_LINES, start_seq=1):
+        self._entries = deque(maxlen=capacity)
+        self._next_seq = start_seq
+        self._lock = threading.Lock()
+
+    def append(self, line):
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._entries.append((seq, line))
+            return seq
+
+    def since(self, after=0):
+        """Entries with seq > after, plus the oldest seq still held so readers can drop evicted lines"""
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[0] > after] if after else list(self._entries)
+            first_seq = self._entries[0][0] if self._entries else self._next_seq
+            return {'entries': entries, 'first_seq': first_seq, 'last_seq': self._next_seq - 1}
+
+    def clear(self):
+        # Sequence numbers keep increasing so readers never see a seq reused
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def last_seq(self):
+        return self._next_seq - 1
+
+class StreamEngine:
+    """Launches and tracks streams per session; the UI only reads snapshots of it"""
+
+    def __init__(self):
+        self.supervisor = get_stream_supervisor()
+        self._streams = {}
+        self._log_seq = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        """Forget streams that ended long ago; only their last log seq is kept. Call with the lock held"""
+        cutoff = (datetime.now() - timedelta(seconds=ENGINE_STREAM_RETENTION_SECONDS)).isoformat()
+        for key, state in list(self._streams.items()):
+            if not state['streaming'] and state.get('ended_at') and state['ended_at'] < cutoff:
+                self._log_seq[key] = state['live_logs'].last_seq
+                del self._streams[key]
+
+    def _new_log_ring(self, owner, batch_keys):
+        """Log ring that continues the numbering of earlier runs of these batches"""
+        with self._lock:
+            self._prune()
+            last_seqs = [
+                self._streams[(owner, key)]['live_logs'].last_seq if (owner, key) in self._streams
+                else self._log_seq.get((owner, key), 0)
+                for key in batch_keys
+            ]
+        return LogRing(start_seq=max(last_seqs) + 1)
+
+    def start_stream(self, spec):
+        """Start one stream from a JSON-serializable spec"""
+        owner = spec.get('session_id') or "default"
+        batch_index = spec.get('batch_index', 0)
+        batch_key = f"batch_{batch_index}"
+        is_shorts = spec.get('is_shorts', False)
+        
+        video_settings = dict(spec.get('video_settings') or DEFAULT_VIDEO_SETTINGS)
+        settings_valid, settings_message = validate_encoder_settings(video_settings)
+        if not settings_valid:
+            return {'error': settings_message}
+        
+        # Resolve stream copy vs encode once so the decision shows in the batch status
+        playlist_name = spec.get('playlist')
+        if playlist_name:
+            if not load_playlist(playlist_name):
+                return {'error': f"Playlist not found: {playlist_name}"}
+            stream_path, use_copy, copy_reason = spec['video_path'], False, f"playlist '{playlist_name}'"
+        else:
+            stream_path, use_copy, copy_reason = resolve_stream_source(spec['video_path'], video_settings, is_shorts)
+        video_settings["copy_mode"] = "copy" if use_copy else "encode"
+        
+        state = {
+            'streaming': True,
+            'stream_start_time': datetime.now().isoformat(),
+            'video_path': spec['video_path'],
+            'encode_mode': video_settings["copy_mode"],
+            'encode_reason': copy_reason,
+            'estimated_cores': estimate_stream_cores(video_settings, use_copy)[0],
+            'process_key': batch_key,
+            'shared_with': [],
+            'outcome': None,
+            'playlist': playlist_name,
+            'now_playing': None,
+            'live_logs': self._new_log_ring(owner, [batch_key])
+        }
+        
+        def log_callback(msg):
+            state['live_logs'].append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        
+        def on_item(path):
+            state['now_playing'] = path
+        
+        # The feeder outlives ffmpeg restarts, so a reconnect continues with the next item
+        feeder = PlaylistFeeder(playlist_name, batch_index, log_callback, on_item) if playlist_name else None
+        
+        def target():
+            try:
+                state['outcome'] = run_ffmpeg(stream_path, spec['stream_key'], is_shorts, log_callback, spec.get('rtmp_url'),
+                                              spec.get('session_id'), spec.get('duration_limit'), video_settings, batch_index,
+                                              playlist=feeder)
+            finally:
+                state['streaming'] = False
+                state['ended_at'] = datetime.now().isoformat()
+        
+        with self._lock:
+            self._streams[(owner, batch_key)] = state
+        threading.Thread(target=target, name=f"ffmpeg-{owner}-{batch_key}", daemon=True).start()
+        return {'batch_key': batch_key, 'encode_mode': state['encode_mode'], 'encode_reason': copy_reason}
+
+    def start_shared_stream(self, specs):
+        """Serve several batches of the same source from one ffmpeg process
+        
+        Identical settings are encoded once and tee'd to every output; differing
+        settings or Shorts flags become a rendition ladder over a single decode.
+        """
+        lead = specs[0]
+        owner = lead.get('session_id') or "default"
+        batch_keys = [f"batch_{spec.get('batch_index', 0)}" for spec in specs]
+        output_urls = [spec.get('rtmp_url') or f"rtmp://a.rtmp.youtube.com/live2/{spec['stream_key']}" for spec in specs]
+        
+        member_settings = []
+        for spec in specs:
+            video_settings = dict(spec.get('video_settings') or DEFAULT_VIDEO_SETTINGS)
+            settings_valid, settings_message = validate_encoder_settings(video_settings)
+            if not settings_valid:
+                return {'error': f"Batch {spec.get('batch_index', 0)}: {settings_message}"}
+            member_settings.append((video_settings, spec.get('is_shorts', False)))
+        ladder = len({fanout_group_key(lead['video_path'], settings, is_shorts) for settings, is_shorts in member_settings}) > 1
+        
+        video_settings, is_shorts = member_settings[0]
+        if ladder:
+            stream_path, use_copy, copy_reason = lead['video_path'], False, "rendition ladder from one decode"
+            renditions = [
+                {'video_settings': settings, 'is_shorts': shorts, 'output_url': url}
+                for (settings, shorts), url in zip(member_settings, output_urls)
+            ]
+        else:
+            stream_path, use_copy, copy_reason = resolve_stream_source(lead['video_path'], video_settings, is_shorts)
+            renditions = None
+        video_settings["copy_mode"] = "copy" if use_copy else "encode"
+        
+        # Members share one log buffer and are stopped together through the lead's process
+        live_logs = self._new_log_ring(owner, batch_keys)
+        started = datetime.now().isoformat()
+        states = {}
+        for i, key in enumerate(batch_keys):
+            settings, shorts = member_settings[i]
+            if ladder:
+                # Each rendition pays its own encode, the decode is shared
+                estimated_cores = estimate_stream_cores(settings, False)[0]
+            else:
+                # The encode is paid once for the whole group
+                estimated_cores = estimate_stream_cores(video_settings, use_copy)[0] if i == 0 else 0
+            states[key] = {
+                'streaming': True,
+                'stream_start_time': started,
+                'video_path': lead['video_path'],
+                'encode_mode': video_settings["copy_mode"],
+                'encode_reason': f"{copy_reason} ({rendition_label(settings, shorts)})" if ladder else copy_reason,
+                'estimated_cores': estimated_cores,
+                'process_key': batch_keys[0],
+                'shared_with': [k for k in batch_keys if k != key],
+                'outcome': None,
+                'live_logs': live_logs
+            }
+        
+        def log_callback(msg):
+            live_logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        
+        def target():
+            outcome = None
+            try:
+                outcome = run_ffmpeg(stream_path, None, is_shorts, log_callback, None,
+                                     lead.get('session_id'), lead.get('duration_limit'), video_settings, lead.get('batch_index', 0),
+                                     output_urls=output_urls, renditions=renditions)
+            finally:
+                ended = datetime.now().isoformat()
+                for state in states.values():
+                    state['outcome'] = outcome
+                    state['streaming'] = False
+                    state['ended_at'] = ended
+        
+        with self._lock:
+            for key, state in states.items():
+                self._streams[(owner, key)] = state
+        threading.Thread(target=target, name=f"ffmpeg-{owner}-{batch_keys[0]}-shared", daemon=True).start()
+        return {'batch_keys': batch_keys, 'encode_mode': video_settings["copy_mode"], 'encode_reason': copy_reason}
+
+    def stop_all(self):
+        """Stop the streams of every session, e.g. when the engine shuts down"""
+        exit_codes = self.supervisor.stop_all()
+        with self._lock:
+            for state in self._streams.values():
+                state['streaming'] = False
+        return exit_codes
+
+    def stop_stream(self, owner, batch_keys=None):
+        """Stop some or all streams of a session; returns {batch_key: exit code}"""
+        with self._lock:
+            keys = [key for (o, key) in self._streams if o == owner and (batch_keys is None or key in batch_keys)]
+            # Stopping any member of a shared pipeline stops the whole pipeline
+            process_keys = {self._streams[(owner, key)]['process_key'] for key in keys}
+            affected = [key for (o, key), state in self._streams.items() if o == owner and state['process_key'] in process_keys]
+        exit_codes = self.supervisor.stop_session(owner, batch_keys=list(process_keys))
+        with self._lock:
+            for key in affected:
+                self._streams[(owner, key)]['streaming'] = False
+        return {key: exit_codes.get(self._streams[(owner, key)]['process_key']) for key in affected}
+
+    def restart_stream(self, owner, batch_keys=None):
+        """Reconnect running streams through their restart policy; returns {process key: exit code}"""
+        with self._lock:
+            process_keys = {
+                state['process_key'] for (o, key), state in self._streams.items()
+                if o == owner and state['streaming'] and (batch_keys is None or key in batch_keys)
+            }
+        return {key: self.supervisor.restart(owner, key) for key in process_keys}
+
+    def clear_logs(self, owner):
+        with self._lock:
+            for (o, key), state in self._streams.items():
+                if o == owner:
+                    state['live_logs'].clear()
+        return {'cleared': True}
+
+    def logs_since(self, owner, after=None):
+        """New live log lines per stream; after maps batch_key to the last seq the reader has"""
+        after = after or {}
+        with self._lock:
+            rings = {key: state['live_logs'] for (o, key), state in self._streams.items() if o == owner}
+        return {key: ring.since(int(after.get(key, 0))) for key, ring in rings.items()}
+
+    def playlists_in_use(self):
+        """Names of playlists that running streams of any session are playing"""
+        with self._lock:
+            return sorted({state['playlist'] for state in self._streams.values() if state['streaming'] and state.get('playlist')})
+
+    def host_load(self):
+        """Estimated cores used by all running streams on this host, across sessions"""
+        with self._lock:
+            running = [state for state in self._streams.values() if state['streaming']]
+        return {'cores': sum(state['estimated_cores'] for state in running), 'streams': len(running)}
+
+    def snapshot(self, owner):
+        """JSON-serializable view of a session's streams and processes"""
+        with self._lock:
+            self._prune()
+            streams = {
+                key: {**{k: v for k, v in state.items() if k != 'live_logs'}, 'log_count': len(state['live_logs'])}
+                for (o, key), state in self._streams.items() if o == owner
+            }
+        processes = [
+            {**proc, 'started': proc['started'].isoformat()}
+            for proc in self.supervisor.status(owner)
+        ]
+        return {'streams': streams, 'processes': processes}
+
+class EngineClient:
+    """Talks to a standalone engine started with `python app.py engine`"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def _call(self, method, path, **kwargs):
+        try:
+            response = requests.request(method, f"{self.base_url}{path}", timeout=ENGINE_TIMEOUT, **kwargs)
+            return response.json()
+        except Exception as e:
+            return {'error': f"Streaming engine unreachable at {self.base_url}: {e}"}
+
+    def start_stream(self, spec):
+        return self._call("POST", "/streams", json=spec)
+
+    def start_shared_stream(self, specs):
+        return self._call("POST", "/streams/shared", json=specs)
+
+    def stop_stream(self, owner, batch_keys=None):
+        return self._call("POST", "/streams/stop", json={'owner': owner, 'batch_keys': batch_keys})
+
+    def restart_stream(self, owner, batch_keys=None):
+        return self._call("POST", "/streams/restart", json={'owner': owner, 'batch_keys': batch_keys})
+
+    def clear_logs(self, owner):
+        return self._call("POST", "/logs/clear", json={'owner': owner})
+
+    def logs_since(self, owner, after=None):
+        result = self._call("POST", "/logs", json={'owner': owner, 'after': after or {}})
+        return {} if 'error' in result else result
+
+    def playlists_in_use(self):
+        result = self._call("GET", "/playlists/in-use")
+        return [] if 'error' in result else result['playlists']
+
+    def host_load(self):
+        result = self._call("GET", "/load")
+        return result if 'error' not in result else {'cores': 0, 'streams': 0, 'error': result['error']}
+
+    def snapshot(self, owner):
+        result = self._call("GET", "/snapshot", params={'owner': owner})
+        if 'error' in result:
+            return {'streams': {}, 'processes': [], 'error': result['error']}
+        return result
+
+@st.cache_resource
+def get_stream_engine():
+    """In-process engine shared by all sessions when no standalone engine is configured"""
+    return StreamEngine()
+
+def get_engine():
+    """Standalone engine client if STREAM_ENGINE_URL is set, otherwise the in-process engine"""
+    if ENGINE_URL:
+        return EngineClient(ENGINE_URL)
+    return get_stream_engine()
+
+class EngineRequestHandler(BaseHTTPRequestHandler):
+    """Small JSON API in front of a StreamEngine"""
+
+    engine = None
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        if url.path == "/health":
+            self._send_json({'ok': True})
+        elif url.path == "/load":
+            self._send_json(self.engine.host_load())
+        elif url.path == "/playlists/in-use":
+            self._send_json({'playlists': self.engine.playlists_in_use()})
+        elif url.path == "/snapshot":
+            self._send_json(self.engine.snapshot(params.get('owner', ["default"])[0]))
+        else:
+            self._send_json({'error': "not found"}, 404)
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+            if self.path == "/streams":
+                self._send_json(self.engine.start_stream(payload))
+            elif self.path == "/streams/shared":
+                self._send_json(self.engine.start_shared_stream(payload))
+            elif self.path == "/streams/stop":
+                self._send_json(self.engine.stop_stream(payload['owner'], payload.get('batch_keys')))
+            elif self.path == "/streams/restart":
+                self._send_json(self.engine.restart_stream(payload['owner'], payload.get('batch_keys')))
+            elif self.path == "/logs":
+                self._send_json(self.engine.logs_since(payload['owner'], payload.get('after')))
+            elif self.path == "/logs/clear":
+                self._send_json(self.engine.clear_logs(payload['owner']))
+            else:
+                self._send_json({'error': "not found"}, 404)
+        except Exception as e:
+            self._send_json({'error': str(e)}, 500)
+
+    def do_PUT(self):
+        # Large uploads without the browser: curl -T loop.mp4 http://127.0.0.1:8765/media/loop.mp4
+        url = urllib.parse.urlparse(self.path)
+        if not url.path.startswith("/media/"):
+            self._send_json({'error': "not found"}, 404)
+            return
+        if self.headers.get("Content-Length") is None:
+            # Without a length a dropped connection is indistinguishable from the end of the file
+            self._send_json({'error': "Content-Length required"}, 411)
+            return
+        try:
+            declared = remaining = int(self.headers["Content-Length"])
+            
+            def read_chunk(size):
+                nonlocal remaining
+                chunk = self.rfile.read(min(size, remaining)) if remaining > 0 else b""
+                remaining -= len(chunk)
+                return chunk
+            
+            path, duplicate = store_media_upload(read_chunk, urllib.parse.unquote(url.path[len("/media/"):]),
+                                                 expected_bytes=declared)
+            self._send_json({'path': path, 'duplicate': duplicate})
+        except ValueError as e:
+            self._send_json({'error': str(e)}, 400)
+        except Exception as e:
+            self._send_json({'error': str(e)}, 500)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_engine(host=ENGINE_HOST, port=ENGINE_PORT):
+    """Run the streaming engine as a standalone service on a localhost port"""
+    init_database()
+    LogPruner()
+    EngineRequestHandler.engine = StreamEngine()
+    JobScheduler(engine=EngineRequestHandler.engine, health=StreamHealthPoller(engine=EngineRequestHandler.engine))
+    server = ThreadingHTTPServer((host, port), EngineRequestHandler)
+    print(f"Streaming engine listening on http://{host}:{port}")
+    
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    # systemctl stop sends SIGTERM; route it through the same shutdown as Ctrl+C
+    signal.signal(signal.SIGTERM, interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Every session's streams, not only the default one, must not outlive the engine
+        EngineRequestHandler.engine.stop_all()
+        server.server_close()
+
+def render_live_logs(session_id):
+    """Live log panel; runs as a fragment so auto-refresh only reruns this part of the page"""
+    engine = get_engine()
+    streams = engine.snapshot(session_id)['streams']
+    
+    # Keep a local copy per stream and only fetch lines newer than the last seq seen
+    view = st.session_state.setdefault('live_log_view', {})
+    after = {key: lines[-1][0] for key, lines in view.items() if lines}
+    updates = engine.logs_since(session_id, after)
+    # A restarted engine numbers its rings from 1 again: drop the stale copy and read the new ring from the start
+    stale = [key for key, update in updates.items() if update['last_seq'] < after.get(key, 0)]
+    if stale:
+        for key in stale:
+            view.pop(key, None)
+            after.pop(key, None)
+        fresh = engine.logs_since(session_id, after)
+        updates.update({key: fresh[key] for key in stale if key in fresh})
+    for key, update in updates.items():
+        lines = [entry for entry in view.get(key, []) if entry[0] >= update['first_seq']]
+        lines.extend(tuple(entry) for entry in update['entries'])
+        view[key] = lines[-ENGINE_LOG_LINES:]
+    
+    single_logs = view.get('batch_0')
+    if streams.get('batch_0') and single_logs:
+        # Show last 50 live logs
+        logs_text = "\n".join(line for _, line in single_logs[-50:])
+        st.text_area("Live Logs", logs_text, height=300, disabled=True, key="live_logs_display")
+    else:
+        st.info("No live logs available. Start streaming to see real-time logs.")
+    
+    # Batch logs if available
+    for batch_key, batch_data in streams.items():
+        if batch_key == 'batch_0' or not batch_data.get('streaming', False):
+            continue
+        batch_index = batch_key.replace('batch_', '')
+        with st.expander(f"🔄 Batch {batch_index} Logs"):
+            mode_label = "📦 Stream copy" if batch_data['encode_mode'] == "copy" else "🎛️ Encoding"
+            st.caption(f"{mode_label} — {batch_data.get('encode_reason', '')}")
+            if batch_data.get('shared_with'):
+                shared = ", ".join(key.replace('batch_', '') for key in batch_data['shared_with'])
+                st.caption(f"🔀 Shares one ffmpeg pipeline with batch {shared}")
+            if batch_data.get('now_playing'):
+                st.caption(f"📃 {batch_data['playlist']}: now playing {os.path.basename(batch_data['now_playing'])}")
+            recent_batch_logs = view.get(batch_key, [])[-20:]  # Last 20 logs per batch
+            batch_logs_text = "\n".join(line for _, line in recent_batch_logs)
+            st.text_area(f"Batch {batch_index} Logs", batch_logs_text, height=150, disabled=True, key=f"batch_{batch_index}_logs")
+
+def auto_start_shared_streaming(video_path, members, session_id=None):
+    """Start several batches that stream the same video as one pipeline
+    
+    members: [(batch_index, stream_key, video_settings, is_shorts)]
+    """
+    result = get_engine().start_shared_stream([
+        {
+            'video_path': video_path,
+            'stream_key': stream_key,
+            'is_shorts': is_shorts,
+            'session_id': session_id,
+            'video_settings': video_settings,
+            'batch_index': batch_index
+        }
+        for batch_index, stream_key, video_settings, is_shorts in members
+    ])
+    batch_list = ", ".join(str(member[0]) for member in members)
+    if not result or 'error' in result:
+        st.error(f"❌ Batches {batch_list}: Streaming engine error: {(result or {}).get('error', 'no response')}")
+        return False
+    
+    log_to_database(session_id, "INFO", f"Batches {batch_list}: Shared streaming started: {video_path}")
+    return True
+
+def fanout_group_key(video_path, video_settings, is_shorts=False):
+    """Batches with equal keys can share one decode and encode"""
+    encoding = {k: v for k, v in video_settings.items() if k not in _NON_ENCODING_SETTINGS}
+    return (os.path.abspath(video_path), json.dumps(encoding, sort_keys=True), bool(is_shorts))
+
+def batch_video_settings(video_settings, batch_config):
+    """Global video settings overlaid with the batch's saved encoder profile, if any"""
+    settings = dict(video_settings or DEFAULT_VIDEO_SETTINGS)
+    profile_name = batch_config.get('encoder_profile')
+    if profile_name:
+        settings.update(load_encoder_profiles().get(profile_name, {}))
+    return settings
+
+# Concurrent batch provisioning limits
+PROVISION_CONCURRENCY = 4
+PROVISION_RETRIES = 3
+
+def provision_batch_broadcast(service, settings, session_id=None, batch_index=0, num_retries=PROVISION_RETRIES, scheduled_start=None):
+    """Create and bind one batch broadcast from a worker thread; returns (live_info, seconds, error)
+
+    The broadcast is announced for scheduled_start, or 30 seconds from now.
+    """
+    started = time.monotonic()
+    try:
+        live_info = _create_live_stream(
+            service,
+            settings['title'],
+            settings['description'],
+            scheduled_start or datetime.now() + timedelta(seconds=30),
+            settings['tags'],
+            settings['category_id'],
+            settings['privacy_status'],
+            settings['made_for_kids'],
+            num_retries=num_retries
+        )
+        elapsed = time.monotonic() - started
+        log_to_database(session_id, "INFO", f"Batch {batch_index}: Auto YouTube Live created in {elapsed:.1f}s: {live_info['watch_url']}")
+        return live_info, elapsed, None
+    except Exception as e:
+        elapsed = time.monotonic() - started
+        log_to_database(session_id, "ERROR", f"Batch {batch_index}: Error creating auto YouTube Live after {elapsed:.1f}s: {e}")
+        return None, elapsed, str(e)
+
+# Broadcast scheduler timing
+SCHEDULER_TICK_SECONDS = 1
+SCHEDULER_PROVISION_LEAD_SECONDS = 300
+SCHEDULER_ACTIVE_STATUSES = ("pending", "provisioning", "provisioned", "running")
+SCHEDULER_HEARTBEAT_SECONDS = 10
+SCHEDULER_HEARTBEAT_TIMEOUT_SECONDS = 60
+
+def process_alive(host, pid):
+    """Whether a PID on this host still exists; processes on other hosts cannot be checked and count as alive"""
+    if not pid:
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _cron_field(field, low, high):
+    """Values matched by one cron field: *, lists, ranges and /steps"""
+    values = set()
+    for part in field.split(","):
+        expr, _, step = part.partition("/")
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (int(v) for v in expr.split("-", 1))
+        else:
+            start = end = int(expr)
+        if start < low or end > high or start > end:
+            raise ValueError(f"cron field {part!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+def cron_next_run(cron, timezone, after_utc):
+    """Next naive-UTC time after after_utc matching a 5-field cron expression in the given timezone
+
+    Unlike classic cron, a restricted day-of-month and weekday must both match.
+    """
+    pytz = import_optional("pytz", "pytz")
+    fields = cron.split()
+    if len(fields) != 5:
+        raise ValueError("cron expression needs 5 fields: minute hour day month weekday")
+    minutes, hours, days, months = (_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields[:4], [(0, 59), (0, 23), (1, 31), (1, 12)]))
+    # Cron weekdays run from 0 = Sunday, Python's from 0 = Monday; 7 is also Sunday
+    weekdays = {(d - 1) % 7 for d in _cron_field(fields[4], 0, 7)}
+    
+    tz = pytz.timezone(timezone)
+    local = pytz.utc.localize(after_utc).astimezone(tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+    limit = local + timedelta(days=366 * 4)
+    while local < limit:
+        if local.month not in months:
+            local = (local.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+        elif local.day not in days or local.weekday() not in weekdays:
+            local = local.replace(hour=0, minute=0) + timedelta(days=1)
+        elif local.hour not in hours:
+            local = local.replace(minute=0) + timedelta(hours=1)
+        elif local.minute not in minutes:
+            local += timedelta(minutes=1)
+        else:
+            return tz.normalize(tz.localize(local)).astimezone(pytz.utc).replace(tzinfo=None)
+    raise ValueError(f"cron expression {cron!r} never matches")
+
+def local_to_utc(local_dt, timezone):
+    """Naive UTC for a naive wall-clock time in a timezone"""
+    pytz = import_optional("pytz", "pytz")
+    tz = pytz.timezone(timezone)
+    return tz.normalize(tz.localize(local_dt)).astimezone(pytz.utc).replace(tzinfo=None)
+
+def utc_to_local(utc_dt, timezone):
+    pytz = import_optional("pytz", "pytz")
+    return pytz.utc.localize(utc_dt).astimezone(pytz.timezone(timezone)).replace(tzinfo=None)
+
+def add_scheduled_job(name, channel_name, spec, timezone, start_local=None, duration_seconds=None, cron=None):
+    """Persist a one-shot (start_local) or recurring (cron) broadcast job; returns its id"""
+    try:
+        if cron:
+            next_run = cron_next_run(cron, timezone, datetime.utcnow())
+        else:
+            next_run = local_to_utc(start_local, timezone)
+        
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        now = datetime.now().isoformat()
+        cursor.execute('''
+            INSERT INTO scheduled_jobs (name, channel_name, spec, timezone, cron, next_run_utc, duration_seconds, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
+        ''', (name, channel_name, json.dumps(spec), timezone, cron, next_run.isoformat(), duration_seconds, now, now))
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return job_id
+    except Exception as e:
+        st.error(f"Error scheduling broadcast: {e}")
+        return None
+
+def load_scheduled_jobs(limit=50):
+    """Scheduled jobs, active ones first, as dicts"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT * FROM scheduled_jobs
+            ORDER BY status NOT IN ({', '.join('?' * len(SCHEDULER_ACTIVE_STATUSES))}), next_run_utc
+            LIMIT ?
+        ''', (*SCHEDULER_ACTIVE_STATUSES, limit))
+        jobs = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return jobs
+    except Exception as e:
+        st.error(f"Error loading scheduled jobs: {e}")
+        return []
 
-# Fungsi untuk auto start streaming
-def auto_start_streaming(video_path, stream_key, is_shorts=False, custom_rtmp=None, session_id=None, duration_limit=None, video_settings=None, batch_index=0):
-    """Auto start streaming dengan konfigurasi default"""
-    if not video_path or not stream_key:
-        st.error("❌ Video atau stream key tidak ditemukan!")
+def cancel_scheduled_job(job_id):
+    """Cancel a job; a running job is stopped by the scheduler on its next tick"""
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        conn.execute("UPDATE scheduled_jobs SET status = 'cancelling', updated_at = ? WHERE id = ? AND status = 'running'",
+                     (datetime.now().isoformat(), job_id))
+        conn.execute("UPDATE scheduled_jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status IN ('pending', 'provisioning', 'provisioned')",
+                     (datetime.now().isoformat(), job_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error cancelling job: {e}")
         return False
+
+class JobScheduler:
+    """Runs scheduled_jobs: provisions ahead of time, starts on time, stops at the deadline
+
+    All state lives in the table, so jobs resume after a restart. Status changes are
+    conditional updates, and a running job belongs to the scheduler that started it:
+    another one only takes it over once the owner's heartbeat has expired and the
+    ffmpeg it recorded is gone, so two schedulers on one database never run a job twice.
+    """
+
+    def __init__(self, engine=None, tick=SCHEDULER_TICK_SECONDS, health=None):
+        self.engine = engine
+        self.tick_seconds = tick
+        self.health = health
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.last_error = None
+        # YouTube calls with retries run here so a slow provision never delays the tick
+        self._provisioner = ThreadPoolExecutor(max_workers=PROVISION_CONCURRENCY, thread_name_prefix="job-provision")
+        self._thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+        self._thread.start()
+
+    def _engine(self):
+        return self.engine or get_engine()
+
+    @staticmethod
+    def _claim(conn, job_id, from_status, to_status, **fields):
+        """Move a job between statuses; returns False if another scheduler got there first"""
+        assignments = "".join(f", {column} = ?" for column in fields)
+        cursor = conn.execute(
+            f"UPDATE scheduled_jobs SET status = ?, updated_at = ?{assignments} WHERE id = ? AND status = ?",
+            (to_status, datetime.now().isoformat(), *fields.values(), job_id, from_status)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def _provision(self, job):
+        """Create the broadcast of a job the tick claimed as provisioning; runs on a provisioning worker"""
+        conn = sqlite3.connect(LOG_DB_PATH, timeout=30)
+        try:
+            spec = json.loads(job['spec'])
+            row = conn.execute("SELECT channel_id, auth_data FROM saved_channels WHERE channel_name = ?",
+                               (job['channel_name'],)).fetchone()
+            if row:
+                # Viewers see the job's own start time, not the moment it was provisioned
+                pytz = import_optional("pytz", "pytz")
+                scheduled_start = max(datetime.fromisoformat(job['next_run_utc']), datetime.utcnow() + timedelta(seconds=30))
+                service = get_youtube_registry().get(json.loads(row[1]), row[0])
+                live_info, elapsed, error = provision_batch_broadcast(service, {
+                    'title': spec.get('title', job['name']),
+                    'description': spec.get('description', ""),
+                    'tags': spec.get('tags', []),
+                    'category_id': spec.get('category_id', "20"),
+                    'privacy_status': spec.get('privacy', "public"),
+                    'made_for_kids': spec.get('made_for_kids', False)
+                }, f"scheduled_{job['id']}", scheduled_start=pytz.utc.localize(scheduled_start))
+                if not live_info:
+                    raise RuntimeError(error)
+            elif spec.get('stream_key'):
+                live_info = {'stream_key': spec['stream_key']}
+            else:
+                raise RuntimeError(f"channel {job['channel_name']} has no saved authentication or stream key")
+            self._claim(conn, job['id'], "provisioning", "provisioned", live_info=json.dumps(live_info))
+        except Exception as e:
+            self._finish(conn, job, "provisioning", "failed", str(e))
+        finally:
+            conn.close()
+
+    def _start(self, conn, job, now):
+        deadline = self._deadline(job)
+        if deadline and deadline <= now:
+            self._finish(conn, job, job['status'], "missed", "deadline passed before the stream could start")
+            return
+        session_id = f"scheduled_{job['id']}"
+        if not self._claim(conn, job['id'], job['status'], "running", session_id=session_id, started_at_utc=now.isoformat(),
+                           owner=self.owner, heartbeat_utc=now.isoformat(), stream_pid=None):
+            return
+        spec = json.loads(job['spec'])
+        live_info = json.loads(job['live_info'])
+        result = self._engine().start_stream({
+            'video_path': spec['video'],
+            'stream_key': live_info['stream_key'],
+            'is_shorts': spec.get('is_shorts', False),
+            'session_id': session_id,
+            'video_settings': spec.get('video_settings'),
+            'duration_limit': int((deadline - now).total_seconds()) if deadline else None
+        })
+        if not result or 'error' in result:
+            self._finish(conn, dict(job, status="running"), "running", "failed", (result or {}).get('error', "engine did not respond"))
+            return
+        log_to_database(session_id, "INFO", f"Scheduled job '{job['name']}' started: {spec['video']}", spec['video'])
+        if self.health and live_info.get('stream_id'):
+            row = conn.execute("SELECT channel_id, auth_data FROM saved_channels WHERE channel_name = ?", (job['channel_name'],)).fetchone()
+            if row:
+                self.health.watch(session_id, "batch_0", get_youtube_registry().get(json.loads(row[1]), row[0]), live_info['stream_id'])
+
+    @staticmethod
+    def _deadline(job):
+        if not job['duration_seconds']:
+            return None
+        return datetime.fromisoformat(job['next_run_utc']) + timedelta(seconds=job['duration_seconds'])
+
+    def _finish(self, conn, job, from_status, status, error=None):
+        """End one run; recurring jobs go back to pending at their next cron time"""
+        if job['cron'] and status in ("done", "failed", "missed"):
+            next_run = cron_next_run(job['cron'], job['timezone'], max(datetime.utcnow(), datetime.fromisoformat(job['next_run_utc'])))
+            self._claim(conn, job['id'], from_status, "pending", next_run_utc=next_run.isoformat(), live_info=None, last_error=error)
+        else:
+            self._claim(conn, job['id'], from_status, status, last_error=error)
+        if error:
+            log_to_database(job['session_id'] or f"scheduled_{job['id']}", "ERROR", f"Scheduled job '{job['name']}': {error}")
+
+    def _take_over(self, conn, job, now):
+        """Claim a running job of another scheduler; False while that scheduler or its ffmpeg may still be alive"""
+        heartbeat = datetime.fromisoformat(job['heartbeat_utc']) if job['heartbeat_utc'] else None
+        if heartbeat and (now - heartbeat).total_seconds() < SCHEDULER_HEARTBEAT_TIMEOUT_SECONDS:
+            return False
+        host = (job['owner'] or "").rpartition(":")[0]
+        if process_alive(host, job['stream_pid']):
+            # The owner died but its ffmpeg still pushes to the stream key; starting another would double it
+            return False
+        cursor = conn.execute(
+            "UPDATE scheduled_jobs SET owner = ?, heartbeat_utc = ?, stream_pid = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ? AND owner IS ? AND heartbeat_utc IS ?",
+            (self.owner, now.isoformat(), datetime.now().isoformat(), job['id'], job['status'], job['owner'], job['heartbeat_utc'])
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            log_to_database(job['session_id'], "INFO", f"Scheduled job '{job['name']}' taken over from {job['owner'] or 'unknown scheduler'}")
+        return cursor.rowcount == 1
+
+    def _heartbeat(self, conn, job, now, pid):
+        heartbeat = datetime.fromisoformat(job['heartbeat_utc']) if job['heartbeat_utc'] else None
+        if pid == job['stream_pid'] and heartbeat and (now - heartbeat).total_seconds() < SCHEDULER_HEARTBEAT_SECONDS:
+            return
+        conn.execute("UPDATE scheduled_jobs SET heartbeat_utc = ?, stream_pid = ? WHERE id = ? AND owner = ?",
+                     (now.isoformat(), pid, job['id'], self.owner))
+        conn.commit()
+
+    def _check_running(self, conn, job, now):
+        if job['owner'] != self.owner and not self._take_over(conn, job, now):
+            return
+        snapshot = self._engine().snapshot(job['session_id'])
+        if 'error' in snapshot:
+            # Engine unreachable: leave the job alone rather than starting it twice, but keep holding it
+            self._heartbeat(conn, job, now, job['stream_pid'])
+            return
+        streams = snapshot['streams']
+        streaming = any(state.get('streaming') for state in streams.values())
+        deadline = self._deadline(job)
+        self._heartbeat(conn, job, now, next((proc['pid'] for proc in snapshot['processes'] if proc['running']), None))
+        
+        if job['status'] == "cancelling":
+            self._engine().stop_stream(job['session_id'])
+            self._claim(conn, job['id'], "cancelling", "cancelled")
+        elif deadline and now >= deadline - timedelta(seconds=5):
+            if streaming:
+                self._engine().stop_stream(job['session_id'])
+            self._finish(conn, job, "running", "done")
+        elif not streaming:
+            # Nothing is streaming before the deadline: the engine restarted, so resume with the time left
+            if streams:
+                self._finish(conn, job, "running", "done" if not deadline else "failed",
+                             None if not deadline else "stream ended before its deadline")
+            elif self._claim(conn, job['id'], "running", "provisioned"):
+                self._start(conn, dict(job, status="provisioned"), now)
+
+    def tick(self):
+        """One scheduling pass"""
+        now = datetime.utcnow()
+        conn = sqlite3.connect(LOG_DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            lead = (now + timedelta(seconds=SCHEDULER_PROVISION_LEAD_SECONDS)).isoformat()
+            for job in conn.execute("SELECT * FROM scheduled_jobs WHERE status = 'pending' AND next_run_utc <= ?", (lead,)).fetchall():
+                if self._claim(conn, job['id'], "pending", "provisioning"):
+                    self._provisioner.submit(self._provision, dict(job))
+            for job in conn.execute("SELECT * FROM scheduled_jobs WHERE status = 'provisioned' AND next_run_utc <= ?", (now.isoformat(),)).fetchall():
+                self._start(conn, dict(job), now)
+            for job in conn.execute("SELECT * FROM scheduled_jobs WHERE status IN ('running', 'cancelling')").fetchall():
+                self._check_running(conn, dict(job), now)
+        finally:
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.tick_seconds)
+
+@st.cache_resource
+def get_job_scheduler():
+    """Process-wide scheduler; with a standalone engine the engine process runs the scheduler instead
+
+    Streamlit only imports the app for a browser session, so this starts with the first page view.
+    """
+    return JobScheduler(health=get_stream_health_poller())
+
+# YouTube's view of bound ingest streams; liveStreams.list costs one quota unit per call of up to 50 ids
+STREAM_HEALTH_POLL_SECONDS = 30
+STREAM_HEALTH_BATCH_SIZE = 50
+STREAM_HEALTH_RESTART_AFTER_SECONDS = 120
+STREAM_HEALTH_RESTART_COOLDOWN_SECONDS = 600
+STREAM_HEALTH_AUTO_RESTART = os.environ.get("STREAM_HEALTH_AUTO_RESTART", "1") != "0"
+
+class StreamHealthPoller:
+    """Polls healthStatus/streamStatus of every watched batch and caches it for the UI
+
+    Batches of one channel share a single liveStreams.list call per interval, so UI
+    reruns never hit the API. A stream YouTube gets no data from while ffmpeg still
+    runs has its ffmpeg ended, which hands it to the batch's restart policy.
+    """
+
+    def __init__(self, engine=None, interval=STREAM_HEALTH_POLL_SECONDS, auto_restart=STREAM_HEALTH_AUTO_RESTART):
+        self.engine = engine
+        self.interval = interval
+        self.auto_restart = auto_restart
+        self.last_poll = None
+        self.last_error = None
+        self._watched = {}
+        self._health = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="stream-health", daemon=True)
+        self._thread.start()
+
+    def _engine(self):
+        return self.engine or get_engine()
+
+    def watch(self, owner, batch_key, service, stream_id):
+        """Start polling the YouTube stream bound to one batch"""
+        with self._lock:
+            self._watched[(owner, batch_key)] = {'service': service, 'stream_id': stream_id}
+            self._health.pop((owner, batch_key), None)
+
+    def health(self, owner):
+        """Cached health per batch_key of one session"""
+        with self._lock:
+            return {key: dict(health) for (o, key), health in self._health.items() if o == owner}
+
+    def poll(self):
+        """One pass: drop finished batches, fetch status per channel, restart streams YouTube gets nothing from"""
+        with self._lock:
+            watched = dict(self._watched)
+
+        engine = self._engine()
+        streaming = {}
+        for owner in {o for o, _ in watched}:
+            snapshot = engine.snapshot(owner)
+            if 'error' in snapshot:
+                # Engine unreachable: keep watching, but never restart blind
+                streaming.update({(o, key): None for (o, key) in watched if o == owner})
+                continue
+            for o, key in watched:
+                if o == owner:
+                    streaming[(o, key)] = snapshot['streams'].get(key, {}).get('streaming', False)
+        with self._lock:
+            for key in [key for key, active in streaming.items() if active is False]:
+                self._watched.pop(key, None)
+                self._health.pop(key, None)
+        watched = {key: entry for key, entry in watched.items() if streaming.get(key) is not False}
+
+        by_service = {}
+        for key, entry in watched.items():
+            by_service.setdefault(id(entry['service']), (entry['service'], []))[1].append((key, entry['stream_id']))
+
+        now = datetime.now()
+        for service, members in by_service.values():
+            ids = sorted({stream_id for _, stream_id in members})
+            try:
+                statuses = {}
+                for i in range(0, len(ids), STREAM_HEALTH_BATCH_SIZE):
+                    response = service.liveStreams().list(
+                        part="status",
+                        id=",".join(ids[i:i + STREAM_HEALTH_BATCH_SIZE]),
+                        maxResults=STREAM_HEALTH_BATCH_SIZE
+                    ).execute()
+                    statuses.update({item['id']: item.get('status', {}) for item in response.get('items', [])})
+            except Exception as e:
+                self.last_error = str(e)
+                log_to_database(None, "ERROR", f"Stream health poll failed for {len(ids)} streams: {e}")
+                continue
+            for key, stream_id in members:
+                self._update(key, statuses.get(stream_id), now, streaming.get(key))
+        self.last_poll = now
+
+    def _update(self, key, status, now, streaming):
+        if status is None:
+            stream_status, health_status, issues = "missing", None, ["Stream not found on YouTube"]
+        else:
+            health = status.get('healthStatus', {})
+            stream_status, health_status = status.get('streamStatus'), health.get('status')
+            # e.g. bitrateLow or gopSizeOver with YouTube's own description
+            issues = [
+                f"{issue.get('severity', 'info')}: {issue.get('description') or issue.get('reason') or issue.get('type')}"
+                for issue in health.get('configurationIssues', [])
+            ]
+
+        with self._lock:
+            previous = self._health.get(key, {})
+            receiving = stream_status == "active" and health_status != "noData"
+            entry = {
+                'stream_status': stream_status,
+                'health_status': health_status,
+                'issues': issues,
+                'checked_at': now.isoformat(),
+                'no_data_since': None if receiving else previous.get('no_data_since') or now.isoformat(),
+                'restarted_at': previous.get('restarted_at')
+            }
+            self._health[key] = entry
+
+        if receiving or not self.auto_restart or not streaming:
+            return
+        # Give a fresh or just restarted stream time to reach YouTube before acting
+        if (now - datetime.fromisoformat(entry['no_data_since'])).total_seconds() < STREAM_HEALTH_RESTART_AFTER_SECONDS:
+            return
+        if entry['restarted_at'] and (now - datetime.fromisoformat(entry['restarted_at'])).total_seconds() < STREAM_HEALTH_RESTART_COOLDOWN_SECONDS:
+            return
+        owner, batch_key = key
+        log_to_database(owner, "ERROR", f"Batch {batch_key.replace('batch_', '')}: YouTube reports {stream_status}/{health_status}, restarting ffmpeg")
+        self._engine().restart_stream(owner, [batch_key])
+        with self._lock:
+            entry['restarted_at'] = now.isoformat()
+            entry['no_data_since'] = now.isoformat()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+
+@st.cache_resource
+def get_stream_health_poller():
+    """Process-wide stream health poller"""
+    return StreamHealthPoller()
+
+def validate_batch_config(config):
+    """Validate a headless run config: the channel config format plus a list of batches"""
+    valid, message = validate_channel_config(config)
+    if not valid:
+        return valid, message
     
-    # Set session state untuk streaming
-    if 'batch_streams' not in st.session_state:
-        st.session_state['batch_streams'] = {}
+    channel_names = {channel['name'] for channel in config['channels']}
+    batches = config.get('batches')
+    if not isinstance(batches, list) or not batches:
+        return False, "batches must be a non-empty list"
+    for i, batch in enumerate(batches):
+        if batch.get('channel') not in channel_names:
+            return False, f"Batch {i+1} references unknown channel: {batch.get('channel')}"
+        if batch.get('playlist'):
+            if not load_playlist(batch['playlist']):
+                return False, f"Batch {i+1} playlist not found: {batch['playlist']}"
+        elif not batch.get('video') or not os.path.exists(batch['video']):
+            return False, f"Batch {i+1} video not found: {batch.get('video')}"
     
-    batch_key = f"batch_{batch_index}"
-    st.session_state['batch_streams'][batch_key] = {
-        'streaming': True,
-        'stream_start_time': datetime.now(),
-        'live_logs': []
-    }
+    settings_valid, settings_message = validate_encoder_settings(dict(DEFAULT_VIDEO_SETTINGS, **config.get('video_settings', {})))
+    if not settings_valid:
+        return False, settings_message
+    return True, "Valid configuration"
+
+def run_headless(config_path, session_id=None):
+    """Provision, start and supervise the batches of a JSON config without the web UI; returns an exit code"""
+    init_database()
+    LogPruner()
     
-    def log_callback(msg):
-        if 'batch_streams' not in st.session_state:
-            st.session_state['batch_streams'] = {}
-        if batch_key not in st.session_state['batch_streams']:
-            st.session_state['batch_streams'][batch_key] = {'live_logs': []}
-        if 'live_logs' not in st.session_state['batch_streams'][batch_key]:
-            st.session_state['batch_streams'][batch_key]['live_logs'] = []
-            
-        st.session_state['batch_streams'][batch_key]['live_logs'].append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-        # Keep only last 100 logs in memory
-        if len(st.session_state['batch_streams'][batch_key]['live_logs']) > 100:
-            st.session_state['batch_streams'][batch_key]['live_logs'] = st.session_state['batch_streams'][batch_key]['live_logs'][-100:]
-    
-    # Jalankan FFmpeg di thread terpisah
-    ffmpeg_thread = threading.Thread(
-        target=run_ffmpeg, 
-        args=(video_path, stream_key, is_shorts, log_callback, custom_rtmp or None, session_id, duration_limit, video_settings, batch_index), 
-        daemon=True
-    )
-    ffmpeg_thread.start()
+    with open(config_path) as f:
+        config = json.load(f)
+    valid, message = validate_batch_config(config)
+    if not valid:
+        print(f"Invalid config: {message}", file=sys.stderr)
+        return 2
     
-    # Simpan referensi thread
-    if 'ffmpeg_threads' not in st.session_state:
-        st.session_state['ffmpeg_threads'] = {}
-    st.session_state['ffmpeg_threads'][batch_key] = ffmpeg_thread
+    session_id = session_id or f"headless_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    channels = {channel['name']: channel for channel in config['channels']}
+    base_settings = dict(DEFAULT_VIDEO_SETTINGS, **config.get('video_settings', {}))
+    batches = {index: batch for index, batch in enumerate(config['batches'], start=1)}
+    print(f"Session {session_id}: {len(batches)} batches")
     
-    # Log ke database
-    log_to_database(session_id, "INFO", f"Batch {batch_index}: Auto streaming started: {video_path}")
-    return True
-
-# Fungsi untuk auto create live broadcast dengan setting manual/otomatis
-def auto_create_live_broadcast(service, use_custom_settings=True, custom_settings=None, session_id=None, batch_index=0):
-    """Auto create live broadcast dengan setting manual atau otomatis"""
-    try:
-        with st.spinner(f"Creating auto YouTube Live broadcast for batch {batch_index}..."):
-            # Schedule for immediate start
-            scheduled_time = datetime.now() + timedelta(seconds=30)
-            
-            # Default settings
-            default_settings = {
-                'title': f"Live Stream - Batch {batch_index}",
-                'description': f"Live streaming session - Batch {batch_index}",
-                'tags': [],
-                'category_id': "20",  # Gaming
-                'privacy_status': "public",
-                'made_for_kids': False
-            }
-            
-            # Gunakan setting custom jika tersedia
-            if use_custom_settings and custom_settings:
-                settings = custom_settings
-            else:
-                settings = default_settings
-            
-            live_info = create_live_stream(
-                service, 
-                settings['title'],
-                settings['description'],
-                scheduled_time,
-                settings['tags'],
-                settings['category_id'],
-                settings['privacy_status'],
-                settings['made_for_kids']
-            )
-            
-            if live_info:
-                if 'batch_live_info' not in st.session_state:
-                    st.session_state['batch_live_info'] = {}
-                st.session_state['batch_live_info'][f"batch_{batch_index}"] = live_info
-                st.success(f"🎉 Batch {batch_index}: Auto YouTube Live Broadcast Created Successfully!")
-                log_to_database(session_id, "INFO", f"Batch {batch_index}: Auto YouTube Live created: {live_info['watch_url']}")
-                return live_info
+    # Handlers go in first: provisioning can take minutes and a stop must still clean up what was started
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+    
+    # Channels with OAuth credentials get a fresh broadcast, the others use their fixed stream key
+    bound_streams = {}
+    
+    def stream_key_for(batch_index, batch):
+        if stop_event.is_set():
+            return None, "stopped before provisioning"
+        channel = channels[batch['channel']]
+        if not channel.get('auth') or not batch.get('provision', True):
+            return channel['stream_key'], None
+        service = get_youtube_registry().get(channel['auth'], channel.get('id'))
+        live_info, elapsed, error = provision_batch_broadcast(service, {
+            'title': batch.get('title', f"Live Stream - Batch {batch_index}"),
+            'description': batch.get('description', f"Live streaming session - Batch {batch_index}"),
+            'tags': batch.get('tags', []),
+            'category_id': batch.get('category_id', "20"),
+            'privacy_status': batch.get('privacy', "public"),
+            'made_for_kids': batch.get('made_for_kids', False)
+        }, session_id, batch_index)
+        if live_info:
+            print(f"Batch {batch_index}: broadcast ready in {elapsed:.1f}s: {live_info['watch_url']}")
+            bound_streams[batch_index] = (service, live_info['stream_id'])
+        return (live_info['stream_key'] if live_info else None), error
+    
+    stream_keys = {}
+    with ThreadPoolExecutor(max_workers=PROVISION_CONCURRENCY) as executor:
+        futures = {executor.submit(stream_key_for, index, batch): index for index, batch in batches.items()}
+        for future in as_completed(futures):
+            batch_index = futures[future]
+            try:
+                stream_key, error = future.result()
+            except Exception as e:
+                stream_key, error = None, str(e)
+            if stream_key:
+                stream_keys[batch_index] = stream_key
             else:
-                st.error(f"❌ Batch {batch_index}: Failed to create auto live broadcast")
-                return None
-    except Exception as e:
-        error_msg = f"Batch {batch_index}: Error creating auto YouTube Live: {e}"
-        st.error(error_msg)
-        log_to_database(session_id, "ERROR", error_msg)
-        return None
+                print(f"Batch {batch_index}: provisioning failed: {error}", file=sys.stderr)
+    if stop_event.is_set():
+        print("Stopped during provisioning, no streams started")
+        get_log_writer().flush()
+        return 1
+    
+    # Same video, settings and duration share one pipeline, as in the UI
+    groups = {}
+    for batch_index in sorted(stream_keys):
+        batch = batches[batch_index]
+        settings = batch_video_settings(base_settings, batch)
+        is_shorts = batch.get('is_shorts', False)
+        video_path = playlist_video_label(batch['playlist']) if batch.get('playlist') else batch['video']
+        if config.get('share_encoding', True) and not batch.get('playlist'):
+            group_key = fanout_group_key(batch['video'], settings, is_shorts) + (batch.get('duration'),)
+        else:
+            group_key = (batch_index,)
+        groups.setdefault(group_key, []).append({
+            'video_path': video_path,
+            'playlist': batch.get('playlist'),
+            'stream_key': stream_keys[batch_index],
+            'rtmp_url': batch.get('rtmp_url'),
+            'is_shorts': is_shorts,
+            'session_id': session_id,
+            'video_settings': settings,
+            'batch_index': batch_index,
+            'duration_limit': batch.get('duration')
+        })
+        save_streaming_session(session_id, video_path, batch.get('title', ""), batch.get('description', ""),
+                               ", ".join(batch.get('tags', [])), batch.get('category_id', "20"),
+                               batch.get('privacy', "public"), batch.get('made_for_kids', False), batch['channel'])
+    
+    engine = StreamEngine()
+    health = StreamHealthPoller(engine=engine)
+    started = 0
+    for specs in groups.values():
+        if stop_event.is_set():
+            break
+        result = engine.start_stream(specs[0]) if len(specs) == 1 else engine.start_shared_stream(specs)
+        batch_list = ", ".join(str(spec['batch_index']) for spec in specs)
+        if 'error' in result:
+            print(f"Batch {batch_list}: failed to start: {result['error']}", file=sys.stderr)
+        else:
+            started += len(specs)
+            print(f"Batch {batch_list}: streaming {specs[0]['video_path']} ({result['encode_mode']})")
+            for spec in specs:
+                if spec['batch_index'] in bound_streams:
+                    health.watch(session_id, f"batch_{spec['batch_index']}", *bound_streams[spec['batch_index']])
+    
+    # Supervise until every stream has ended or we are asked to stop; echo live logs for the journal
+    last_seq = {}
+    reported_health = {}
+    failed = started < len(batches)
+    while started:
+        streams = engine.snapshot(session_id)['streams']
+        for batch_key, state in health.health(session_id).items():
+            report = (state['stream_status'], state['health_status'], tuple(state['issues']))
+            if reported_health.get(batch_key) != report:
+                reported_health[batch_key] = report
+                issues = f": {'; '.join(state['issues'])}" if state['issues'] else ""
+                print(f"[{batch_key}] YouTube: {state['stream_status']} · health {state['health_status'] or 'N/A'}{issues}", flush=True)
+        process_keys = {state['process_key'] for state in streams.values()}
+        for batch_key, update in engine.logs_since(session_id, last_seq).items():
+            if update['entries']:
+                last_seq[batch_key] = update['entries'][-1][0]
+            if batch_key in process_keys:
+                for _, line in update['entries']:
+                    print(f"[{batch_key}] {line}", flush=True)
+        if stop_event.is_set():
+            print("Stopping all streams...")
+            engine.stop_stream(session_id)
+            break
+        if not any(state['streaming'] for state in streams.values()):
+            # Nothing left streaming on its own: only a clean finish of every batch counts as success
+            ended = [key for key, state in streams.items() if state.get('outcome') != "completed"]
+            if ended:
+                print(f"Streams ended without completing: {', '.join(sorted(ended))}", file=sys.stderr)
+                failed = True
+            break
+        stop_event.wait(1)
+    
+    get_log_writer().flush()
+    return 1 if failed else 0
 
 def main():
     # Page configuration must be the first Streamlit command
@@ -1047,18 +4614,21 @@ def main():
         layout="wide"
     )
     
+    startup_report()
+    
     # Add custom CSS
     add_custom_css()
     
-    # Initialize database
+    # Initialize database and start the retention pruner and broadcast scheduler
     init_database()
+    get_log_pruner()
+    if not ENGINE_URL:
+        get_job_scheduler()
     
     # Initialize session state
+    # Reattach to a running session from the URL so streams survive page reloads
     if 'session_id' not in st.session_state:
-        st.session_state['session_id'] = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    
-    if 'live_logs' not in st.session_state:
-        st.session_state['live_logs'] = []
+        st.session_state['session_id'] = st.query_params.get('session') or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     # Header with modern design
     st.markdown("""
@@ -1070,6 +4640,8 @@ def main():
     
     # Auto-process authorization code if present
     auto_process_auth_code()
+    if 'code' not in st.query_params:
+        st.query_params['session'] = st.session_state['session_id']
     
     # Sidebar for configuration
     with st.sidebar:
@@ -1093,7 +4665,7 @@ def main():
                 with col2:
                     if st.button("🔑 Use", key=f"use_{channel['name']}"):
                         # Load this channel's authentication
-                        service = create_youtube_service(channel['auth'])
+                        service = create_youtube_service(channel['auth'], channel['id'])
                         if service:
                             # Verify the authentication is still valid
                             channels = get_channel_info(service)
@@ -1178,6 +4750,7 @@ def main():
                                             channel['id'],
                                             creds_dict
                                         )
+                                        get_youtube_registry().assign_channel(service, channel['id'])
                                         st.rerun()
                                     else:
                                         st.error("❌ Could not fetch channel information")
@@ -1201,20 +4774,34 @@ def main():
         
         with col_log2:
             if st.button("🗑️ Clear Session Logs"):
-                st.session_state['live_logs'] = []
+                get_engine().clear_logs(st.session_state['session_id'])
                 st.success("Logs cleared!")
         
+        # Cold start budget and import profile
+        with st.expander("⏱️ Startup Profile"):
+            report = startup_report()
+            budget_label = "✅ within" if report['seconds'] <= STARTUP_BUDGET_SECONDS else "⚠️ over"
+            st.write(f"Cold start: **{report['seconds']:.2f}s** ({budget_label} the {STARTUP_BUDGET_SECONDS}s budget)")
+            if st.button("🔬 Profile Imports"):
+                with st.spinner("Importing the app in a fresh interpreter..."):
+                    st.session_state['import_profile'] = profile_imports()
+            if st.session_state.get('import_profile'):
+                st.dataframe(st.session_state['import_profile'], hide_index=True)
+        
         # Export logs
-        if st.button("📥 Export All Logs"):
-            all_logs = get_logs_from_database(limit=1000)
-            if all_logs:
-                logs_text = "\n".join([f"[{log[0]}] {log[1]}: {log[2]}" for log in all_logs])
-                st.download_button(
-                    label="💾 Download Logs",
-                    data=logs_text,
-                    file_name=f"streaming_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain"
-                )
+        with st.expander("📥 Export Logs"):
+            export_format = st.selectbox("Format", list(export_formats().keys()), key="export_format")
+            export_current_session = st.checkbox("Current session only", key="export_current_session")
+            export_range = st.date_input("Date range", value=(), key="export_range", help="Leave empty for all dates")
+            if st.button("📥 Export All Logs"):
+                st.session_state['export_job_id'] = get_log_exporter().start(export_format, {
+                    'session_id': st.session_state['session_id'] if export_current_session else None,
+                    'since': export_range[0].isoformat() if len(export_range) > 0 else None,
+                    'until': (export_range[-1] + timedelta(days=1)).isoformat() if len(export_range) > 0 else None
+                })
+            if 'export_job_id' in st.session_state:
+                export_running = get_log_exporter().status(st.session_state['export_job_id']).get('status') == "running"
+                st.fragment(render_export_status, run_every=1 if export_running else None)(st.session_state['export_job_id'], export_running)
     
     # Main content area with modern card layout
     col1, col2 = st.columns([2, 1])
@@ -1224,27 +4811,46 @@ def main():
         with st.container():
             st.markdown('<div class="card-header"><h2>🎥 Video & Streaming Setup</h2></div>', unsafe_allow_html=True)
             
-            # Video selection
-            video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.flv', '.avi', '.mov', '.mkv'))]
+            # Video selection from the background-indexed media library
+            media_library = get_media_library()
+            video_files = media_library.videos()
             
             if video_files:
-                st.write("📁 Available videos:")
-                selected_video = st.selectbox("Select video", video_files)
+                st.write(f"📁 Available videos ({len(video_files)} in {', '.join(media_library.dirs)}):")
+                selected_video = st.selectbox("Select video", video_files, format_func=media_label)
             else:
                 selected_video = None
-                st.info("No video files found in current directory")
+                st.info(f"No video files found in {', '.join(media_library.dirs)}")
             
             # Video upload - MODIFIED FOR MULTIPLE UPLOADS
             uploaded_files = st.file_uploader("Or upload new videos", type=['mp4', '.flv', '.avi', '.mov', '.mkv'], accept_multiple_files=True)
 
             if uploaded_files:
                 uploaded_video_paths = []
+                # Each upload is stored once, not again on every rerun while it stays in the widget
+                stored_uploads = st.session_state.setdefault('stored_uploads', {})
                 for uploaded_file in uploaded_files:
-                    with open(uploaded_file.name, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    st.success(f"✅ Video {uploaded_file.name} uploaded successfully!")
-                    uploaded_video_paths.append(uploaded_file.name)
-                    log_to_database(st.session_state['session_id'], "INFO", f"Video uploaded: {uploaded_file.name}")
+                    upload_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+                    if upload_id not in stored_uploads:
+                        try:
+                            uploaded_file.seek(0)
+                            stored_path, duplicate = store_media_upload(uploaded_file.read, uploaded_file.name,
+                                                                        expected_bytes=uploaded_file.size)
+                        except Exception as e:
+                            st.error(f"❌ Upload of {uploaded_file.name} failed: {e}")
+                            continue
+                        stored_uploads[upload_id] = stored_path
+                        if duplicate:
+                            st.info(f"♻️ {uploaded_file.name} is already in the library as {stored_path}")
+                        else:
+                            st.success(f"✅ Video {uploaded_file.name} uploaded successfully!")
+                        log_to_database(st.session_state['session_id'], "INFO", f"Video uploaded: {stored_path}")
+                        
+                        # Warm the pre-transcode cache when it is enabled
+                        upload_settings = st.session_state.get('video_settings') or DEFAULT_VIDEO_SETTINGS
+                        if upload_settings.get('transcode_cache'):
+                            get_transcode_cache().schedule(stored_path, upload_settings)
+                    uploaded_video_paths.append(stored_uploads[upload_id])
                 
                 # Store all uploaded video paths in session state
                 st.session_state['uploaded_video_paths'] = uploaded_video_paths
@@ -1533,7 +5139,8 @@ def main():
                                                             'watch_url': watch_url,
                                                             'studio_url': studio_url,
                                                             'stream_key': stream_info['stream_key'],
-                                                            'stream_url': stream_info['stream_url']
+                                                            'stream_url': stream_info['stream_url'],
+                                                            'stream_id': stream_info['stream_id']
                                                         }
                                                         st.success(f"✅ Using stream: {broadcast['snippet']['title']}")
                                                         st.rerun()
@@ -1641,9 +5248,9 @@ def main():
                     enable_chat = st.checkbox("💬 Enable Live Chat", value=True)
                 
                 with col_tech2:
-                    bitrate = st.selectbox("📊 Bitrate", ["1500k", "2500k", "4000k", "6000k"], index=1)
+                    bitrate = st.selectbox("📊 Bitrate", ["600k", "1000k", "1500k", "2500k", "4000k", "6000k"], index=3)
                     framerate = st.selectbox("🎞️ Frame Rate", ["24", "30", "60"], index=1)
-                    resolution = st.selectbox("📺 Resolution", ["720p", "1080p", "1440p"], index=1)
+                    resolution = st.selectbox("📺 Resolution", ["360p", "480p", "720p", "1080p", "1440p"], index=3)
             
             # Advanced settings
             with st.expander("⚙️ Advanced Settings"):
@@ -1666,15 +5273,68 @@ def main():
             batch_count = st.slider("🔢 Number of Live Batches", min_value=1, max_value=10, value=3, 
                                    help="Jumlah batch streaming secara bersamaan", key="batch_count_slider")
             
+            # Playlists rotate several videos through one batch without dropping the RTMP session
+            st.subheader("📃 Playlists")
+            with st.expander("🛠️ Manage Playlists"):
+                playlists = load_playlists()
+                library_videos = get_media_library().videos()
+                edit_choice = st.selectbox("Playlist", ["(New playlist)"] + list(playlists.keys()), key="playlist_edit_select")
+                editing = playlists.get(edit_choice, {'items': [], 'shuffle': False})
+                playlist_name = st.text_input("Name", value="" if edit_choice == "(New playlist)" else edit_choice,
+                                              key=f"playlist_name_{edit_choice}")
+                playlist_items = st.multiselect("Videos (played in the order selected)", library_videos,
+                                                default=[path for path in editing['items'] if path in library_videos],
+                                                key=f"playlist_items_{edit_choice}", format_func=media_label)
+                playlist_shuffle = st.checkbox("🔀 Shuffle", value=editing['shuffle'], key=f"playlist_shuffle_{edit_choice}")
+                
+                col_pl1, col_pl2 = st.columns(2)
+                with col_pl1:
+                    if st.button("💾 Save Playlist", key="save_playlist"):
+                        new_name = playlist_name.strip()
+                        renaming = edit_choice not in ("(New playlist)", new_name)
+                        if not new_name or not playlist_items:
+                            st.error("❌ A playlist needs a name and at least one video")
+                        elif renaming and edit_choice in get_engine().playlists_in_use():
+                            # Running feeders look the playlist up by name and would lose further edits
+                            st.error(f"❌ '{edit_choice}' is playing on a live batch; stop it before renaming")
+                        elif renaming and not rename_playlist(edit_choice, new_name):
+                            pass
+                        elif save_playlist(new_name, playlist_items, playlist_shuffle):
+                            st.success("✅ Playlist saved; running batches switch over at their next item")
+                with col_pl2:
+                    if edit_choice != "(New playlist)" and st.button("🗑️ Delete Playlist", key="delete_playlist"):
+                        if edit_choice in get_engine().playlists_in_use():
+                            st.error(f"❌ '{edit_choice}' is playing on a live batch; stop it before deleting")
+                        else:
+                            delete_playlist(edit_choice)
+                            st.rerun()
+                
+                if edit_choice != "(New playlist)":
+                    plays = load_playlist_plays(edit_choice)
+                    st.dataframe([
+                        {'Video': os.path.basename(path), 'Plays': plays.get(path, (0, None))[0],
+                         'Last played': plays.get(path, (0, None))[1] or "—"}
+                        for path in editing['items']
+                    ], hide_index=True)
+            
             # Manual Live Stream Settings for Each Batch
             st.subheader("🔧 Batch Configuration")
             with st.expander("🛠️ Configure Each Batch Settings"):
                 # Get all available videos including uploaded ones
-                all_videos = [f for f in os.listdir('.') if f.endswith(('.mp4', '.flv', '.avi', '.mov', '.mkv'))]
+                all_videos = get_media_library().videos()
                 if 'uploaded_video_paths' in st.session_state:
                     all_videos.extend(st.session_state['uploaded_video_paths'])
                     # Remove duplicates
-                    all_videos = list(set(all_videos))
+                    all_videos = sorted(set(all_videos))
+                
+                encoder_profiles = load_encoder_profiles()
+                playlist_names = list(load_playlists().keys())
+                st.checkbox("🔀 Share one encode between batches with the same video and settings", value=True,
+                            key="share_batch_encoding",
+                            help="Uses ffmpeg's tee muxer; a failing output does not stop the others, stopping one batch stops its whole group")
+                st.checkbox("🪜 Rendition ladder: decode a video once for batches with different profiles or Shorts mode", value=False,
+                            key="batch_rendition_ladder",
+                            help="Batches on the same video run in one ffmpeg process that splits the decoded frames into one encode per batch")
                 
                 # Initialize batch configurations
                 if 'batch_configs' not in st.session_state:
@@ -1691,7 +5351,15 @@ def main():
                             f"🎬 Video for Batch {i+1}", 
                             all_videos if all_videos else ["No videos available"], 
                             key=f"batch_video_{i}",
-                            index=0 if all_videos else 0
+                            index=0 if all_videos else 0,
+                            format_func=media_label
+                        )
+                        
+                        # A playlist replaces the single looped video
+                        batch_playlist = st.selectbox(
+                            f"📃 Playlist for Batch {i+1}",
+                            ["(Single video)"] + playlist_names,
+                            key=f"batch_playlist_{i}"
                         )
                         
                         # Title for this batch
@@ -1717,6 +5385,16 @@ def main():
                             key=f"batch_privacy_{i}",
                             index=0
                         )
+                        
+                        # Encoder profile for this batch
+                        batch_encoder_profile = st.selectbox(
+                            f"⚡ Encoder Profile for Batch {i+1}", 
+                            ["(Global settings)"] + list(encoder_profiles.keys()), 
+                            key=f"batch_encoder_profile_{i}",
+                            help="Pick a cheaper saved profile to fit more streams per core"
+                        )
+                        
+                        batch_is_shorts = st.checkbox(f"📱 Shorts Mode (720x1280) for Batch {i+1}", key=f"batch_shorts_{i}")
                     
                     # Store batch configuration
                     st.session_state['batch_configs'][f"batch_{i+1}"] = {
@@ -1726,7 +5404,10 @@ def main():
                         'privacy': batch_privacy,
                         'category_id': category_id,
                         'tags': tags,
-                        'made_for_kids': made_for_kids
+                        'made_for_kids': made_for_kids,
+                        'encoder_profile': None if batch_encoder_profile == "(Global settings)" else batch_encoder_profile,
+                        'is_shorts': batch_is_shorts,
+                        'playlist': None if batch_playlist == "(Single video)" else batch_playlist
                     }
             
             # Manual Live Stream Settings
@@ -1742,7 +5423,9 @@ def main():
                         custom_stream_key = st.text_input("Custom Stream Key", 
                                                          placeholder="your-stream-key")
                     
-                    buffer_size = st.text_input("📦 Buffer Size", value="2048k")
+                    buffer_size = st.text_input("📦 Buffer Size", value="",
+                                                placeholder="2× bitrate",
+                                                help="Leave empty to use twice the video bitrate")
                     keyframe_interval = st.number_input("⏭️ Keyframe Interval", min_value=1, max_value=10, value=2)
                 
                 with col_manual2:
@@ -1762,12 +5445,13 @@ def main():
                 col_video1, col_video2 = st.columns(2)
                 
                 with col_video1:
+                    # 360p/480p with 600k/1000k serve as low-bitrate backup renditions
                     video_resolution = st.selectbox("📺 Resolution", 
-                                                  ["720p", "1080p", "1440p", "2160p"], 
-                                                  index=1)
+                                                  ["360p", "480p", "720p", "1080p", "1440p", "2160p"], 
+                                                  index=3)
                     video_bitrate = st.selectbox("📊 Video Bitrate", 
-                                               ["1500k", "2500k", "4000k", "6000k", "8000k", "12000k"], 
-                                               index=1)
+                                               ["600k", "1000k", "1500k", "2500k", "4000k", "6000k", "8000k", "12000k"], 
+                                               index=3)
                     video_fps = st.selectbox("🎞️ FPS", ["24", "30", "60"], index=1)
                     video_codec = st.selectbox("🎬 Video Codec", ["libx264", "libx265"], index=0)
                 
@@ -1777,6 +5461,12 @@ def main():
                                                index=1)
                     audio_codec = st.selectbox("🔊 Audio Codec", ["aac", "mp3"], index=0)
                     audio_channels = st.selectbox("🎧 Audio Channels", ["mono", "stereo"], index=1)
+                    stream_copy_mode = st.selectbox("📦 Stream Copy", 
+                                                  ["Auto (copy when compatible)", "Always encode"], 
+                                                  index=0,
+                                                  help="Skip re-encoding when the source is already H.264/AAC within the target bitrate")
+                    use_transcode_cache = st.checkbox("🗃️ Pre-transcode Cache", value=True,
+                                                      help="Encode incompatible sources once in the background and stream the cached copy next time")
                     
                     # Save video settings to session state
                     video_settings = {
@@ -1785,35 +5475,127 @@ def main():
                         "fps": video_fps,
                         "codec": video_codec,
                         "audio_bitrate": audio_bitrate,
-                        "audio_codec": audio_codec
+                        "audio_codec": audio_codec,
+                        "audio_channels": audio_channels,
+                        "preset": preset,
+                        "profile": profile,
+                        "tune": tune,
+                        "buffer_size": buffer_size.strip(),
+                        "keyframe_interval": int(keyframe_interval),
+                        "custom_parameters": custom_parameters.strip(),
+                        "copy_mode": "auto" if stream_copy_mode.startswith("Auto") else "encode",
+                        "transcode_cache": use_transcode_cache
                     }
                     st.session_state['video_settings'] = video_settings
+                
+                # Validate the combined encoder settings
+                settings_valid, settings_message = validate_encoder_settings(video_settings)
+                if not settings_valid:
+                    st.error(f"❌ {settings_message}")
+                
+                # Named encoder profiles
+                st.markdown("**💾 Encoder Profiles**")
+                col_prof1, col_prof2 = st.columns([3, 1])
+                with col_prof1:
+                    profile_name = st.text_input("Profile name", placeholder="e.g. 720p-superfast", key="encoder_profile_name")
+                with col_prof2:
+                    if st.button("💾 Save Profile", disabled=not settings_valid):
+                        if profile_name.strip():
+                            if save_encoder_profile(profile_name.strip(), video_settings):
+                                st.success(f"✅ Profile '{profile_name.strip()}' saved")
+                        else:
+                            st.error("Please enter a profile name")
+                
+                for saved_name, saved_settings in load_encoder_profiles().items():
+                    col_saved1, col_saved2 = st.columns([3, 1])
+                    with col_saved1:
+                        st.caption(f"📋 {saved_name}: {saved_settings.get('resolution')} · {saved_settings.get('bitrate')} · {saved_settings.get('fps')}fps · {saved_settings.get('preset', 'veryfast')}")
+                    with col_saved2:
+                        if st.button("🗑️", key=f"delete_profile_{saved_name}"):
+                            delete_encoder_profile(saved_name)
+                            st.rerun()
     
     with col2:
         # Status & Controls Card
         with st.container():
             st.markdown('<div class="card-header"><h2>📊 Status & Controls</h2></div>', unsafe_allow_html=True)
             
-            # Streaming status
-            streaming = st.session_state.get('streaming', False)
+            # Streaming status from the engine snapshot (one read per rerun)
+            engine_snapshot = get_engine().snapshot(st.session_state['session_id'])
+            if 'error' in engine_snapshot:
+                st.error(f"❌ {engine_snapshot['error']}")
+            engine_streams = engine_snapshot['streams']
+            single_stream = engine_streams.get('batch_0')
+            batch_streams = {key: data for key, data in engine_streams.items() if key != 'batch_0'}
+            
+            streaming = bool(single_stream and single_stream['streaming'])
             if streaming:
                 st.markdown('<div style="display:flex; align-items:center;"><span class="status-indicator status-live pulse"></span><strong>LIVE STREAMING</strong></div>', unsafe_allow_html=True)
                 
                 # Live stats
-                if 'stream_start_time' in st.session_state:
-                    duration = datetime.now() - st.session_state['stream_start_time']
-                    st.metric("⏱️ Duration", str(duration).split('.')[0])
+                duration = datetime.now() - datetime.fromisoformat(single_stream['stream_start_time'])
+                st.metric("⏱️ Duration", str(duration).split('.')[0])
             else:
                 st.markdown('<div style="display:flex; align-items:center;"><span class="status-indicator status-offline"></span><strong>OFFLINE</strong></div>', unsafe_allow_html=True)
             
             # Batch Streaming Status
-            if 'batch_streams' in st.session_state:
-                active_batches = sum(1 for batch in st.session_state['batch_streams'].values() if batch.get('streaming', False))
+            active_batches = sum(1 for batch in batch_streams.values() if batch.get('streaming', False))
+            if batch_streams:
                 if active_batches > 0:
                     st.markdown(f'<div style="display:flex; align-items:center;"><span class="status-indicator status-batch pulse"></span><strong>BATCH LIVE ({active_batches} active)</strong></div>', unsafe_allow_html=True)
                 else:
                     st.markdown('<div style="display:flex; align-items:center;"><span class="status-indicator status-offline"></span><strong>BATCH OFFLINE</strong></div>', unsafe_allow_html=True)
             
+            # FFmpeg processes owned by this session
+            process_status = engine_snapshot['processes']
+            if process_status:
+                with st.expander("🧩 FFmpeg Processes", expanded=False):
+                    for proc in process_status:
+                        batch_index = proc['batch_key'].replace('batch_', '')
+                        col_proc1, col_proc2 = st.columns([3, 1])
+                        with col_proc1:
+                            if proc['running']:
+                                st.write(f"🟢 Batch {batch_index} · PID {proc['pid']}")
+                            else:
+                                st.write(f"⚪ Batch {batch_index} · PID {proc['pid']} · exit code {proc['returncode']}")
+                        with col_proc2:
+                            if proc['running'] and st.button("⏹️", key=f"stop_{proc['batch_key']}", help=f"Stop batch {batch_index} only"):
+                                exit_codes = get_engine().stop_stream(st.session_state['session_id'], [proc['batch_key']])
+                                log_to_database(st.session_state['session_id'], "INFO", f"Batch {batch_index}: Stopped by user (exit code {exit_codes.get(proc['batch_key'])})")
+                                st.rerun()
+            
+            # Encoder capacity planner
+            with st.expander("🧮 Encoder Capacity Planner"):
+                host_load = get_engine().host_load()
+                st.write(f"**CPU cores:** {os.cpu_count() or 1} · **In use (est.):** {host_load['cores']:.1f} cores by {host_load['streams']} streams")
+                
+                capacity_enforcement = st.radio("When over capacity", ["⚠️ Warn", "⛔ Refuse"], horizontal=True, key="capacity_enforcement")
+                
+                benchmark_results = load_benchmark_results()
+                if benchmark_results:
+                    st.dataframe([
+                        {'Codec': codec, 'Preset': preset, 'Resolution': resolution, 'FPS': fps,
+                         'Speed/core': round(speed, 2), 'Cores/stream': round(1 / speed, 2) if speed else None}
+                        for codec, preset, resolution, fps, speed, _ in benchmark_results
+                    ], hide_index=True)
+                else:
+                    st.info("No benchmarks yet. Run one so batch starts can be checked against host capacity.")
+                
+                base_settings = st.session_state.get('video_settings', DEFAULT_VIDEO_SETTINGS)
+                bench_sample = st.selectbox("Sample video", video_files or ["No videos available"], key="benchmark_sample")
+                bench_presets = st.multiselect("Presets", ENCODER_PRESETS, default=[base_settings.get('preset', 'veryfast')], key="benchmark_presets")
+                bench_resolutions = st.multiselect("Resolutions", list(RESOLUTION_HEIGHTS), default=[base_settings.get('resolution', '1080p')], key="benchmark_resolutions")
+                bench_fps = st.multiselect("FPS", ["24", "30", "60"], default=[str(base_settings.get('fps', '30'))], key="benchmark_fps")
+                
+                runner = get_benchmark_runner()
+                if runner.status['running']:
+                    st.progress(runner.status['done'] / max(runner.status['total'], 1), text=f"Benchmarking {runner.status['current']}...")
+                elif st.button("⏱️ Run Benchmark", disabled=not video_files):
+                    runner.start(bench_sample, base_settings, bench_presets, bench_resolutions, bench_fps)
+                    st.rerun()
+                for error in runner.status['errors'][-3:]:
+                    st.caption(f"❌ {error}")
+            
             # Control buttons
             if st.button("▶️ Start Streaming", type="primary"):
                 # Get the current stream key
@@ -1837,23 +5619,13 @@ def main():
                         st.session_state.get('channel_info', {}).get('snippet', {}).get('title', 'Unknown')
                     )
                     
-                    # Start streaming
-                    st.session_state['streaming'] = True
-                    st.session_state['stream_start_time'] = datetime.now()
-                    st.session_state['live_logs'] = []
-                    
-                    def log_callback(msg):
-                        if 'live_logs' not in st.session_state:
-                            st.session_state['live_logs'] = []
-                        st.session_state['live_logs'].append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-                        # Keep only last 100 logs in memory
-                        if len(st.session_state['live_logs']) > 100:
-                            st.session_state['live_logs'] = st.session_state['live_logs'][-100:]
-                    
                     # Ambil durasi dari pilihan pengguna
+                    # Duration widgets are rendered further down the page, read them from session state
                     duration_limit = None
+                    duration_option = st.session_state.get('duration_option')
                     if duration_option == "⏱️ Custom Waktu":
-                        duration_limit = total_custom_seconds
+                        duration_limit = (st.session_state.get('custom_duration_hours', 1) * 3600
+                                          + st.session_state.get('custom_duration_minutes', 0) * 60)
                     elif duration_option == "🎬 Ikuti Panjang Video":
                         video_duration = get_video_duration(video_path)
                         if video_duration:
@@ -1864,15 +5636,24 @@ def main():
                     # Get video settings from session state
                     video_settings = st.session_state.get('video_settings', None)
                     
-                    st.session_state['ffmpeg_thread'] = threading.Thread(
-                        target=run_ffmpeg, 
-                        args=(video_path, stream_key, is_shorts, log_callback, custom_rtmp or None, st.session_state['session_id'], duration_limit, video_settings), 
-                        daemon=True
-                    )
-                    st.session_state['ffmpeg_thread'].start()
-                    st.success("🚀 Streaming started!")
-                    log_to_database(st.session_state['session_id'], "INFO", f"Streaming started: {video_path}")
-                    st.rerun()
+                    # Start streaming
+                    if auto_start_streaming(
+                        video_path,
+                        stream_key,
+                        is_shorts=is_shorts,
+                        custom_rtmp=custom_rtmp,
+                        session_id=st.session_state['session_id'],
+                        duration_limit=duration_limit,
+                        video_settings=video_settings,
+                        batch_index=0
+                    ):
+                        st.success("🚀 Streaming started!")
+                        log_to_database(st.session_state['session_id'], "INFO", f"Streaming started: {video_path}")
+                        broadcast_info = st.session_state.get('live_broadcast_info', {})
+                        if 'youtube_service' in st.session_state and broadcast_info.get('stream_key') == stream_key and broadcast_info.get('stream_id'):
+                            get_stream_health_poller().watch(st.session_state['session_id'], "batch_0",
+                                                             st.session_state['youtube_service'], broadcast_info['stream_id'])
+                        st.rerun()
             
             # Batch Start Streaming Button
             if st.button("🔄 Start Batch Streaming", type="primary", help="Start multiple live streams simultaneously with different settings"):
@@ -1886,14 +5667,12 @@ def main():
                 # Get video settings
                 video_settings = st.session_state.get('video_settings', None)
                 
-                # Create and start batch streams
-                success_count = 0
+                # Collect the configured batches
+                batch_jobs = []
                 for i in range(batch_count):
                     batch_key = f"batch_{i+1}"
                     if batch_key in st.session_state.get('batch_configs', {}):
                         batch_config = st.session_state['batch_configs'][batch_key]
-                        
-                        # Create live broadcast for this batch
                         batch_settings = {
                             'title': batch_config['title'],
                             'description': batch_config['description'],
@@ -1902,40 +5681,124 @@ def main():
                             'privacy_status': batch_config['privacy'],
                             'made_for_kids': batch_config['made_for_kids']
                         }
-                        
-                        live_info = auto_create_live_broadcast(
-                            service,
-                            use_custom_settings=True,
-                            custom_settings=batch_settings,
-                            session_id=st.session_state['session_id'],
-                            batch_index=i+1
-                        )
-                        
-                        if live_info:
-                            # Start streaming for this batch with its specific video
-                            if auto_start_streaming(
-                                batch_config['video'],
-                                live_info['stream_key'],
-                                session_id=st.session_state['session_id'],
-                                video_settings=video_settings,
-                                batch_index=i+1
-                            ):
-                                success_count += 1
-                            else:
-                                st.error(f"❌ Failed to start streaming for batch {i+1}")
-                        else:
-                            st.error(f"❌ Failed to create live broadcast for batch {i+1}")
+                        batch_jobs.append((i+1, batch_config, batch_settings))
+                
+                # Group batches that can share one pipeline: same video, and same settings unless a ladder is allowed
+                batch_groups = {}
+                for batch_index, batch_config, batch_settings in batch_jobs:
+                    settings = batch_video_settings(video_settings, batch_config)
+                    batch_is_shorts = batch_config.get('is_shorts', False)
+                    batch_playlist = batch_config.get('playlist')
+                    batch_video = playlist_video_label(batch_playlist) if batch_playlist else batch_config['video']
+                    variant_key = fanout_group_key(batch_video, settings, batch_is_shorts)
+                    if batch_playlist:
+                        # Each playlist batch runs its own feeder and output
+                        group_key = (batch_index,)
+                    elif st.session_state.get('batch_rendition_ladder', False):
+                        group_key = (os.path.abspath(batch_config['video']),)
+                    elif st.session_state.get('share_batch_encoding', True):
+                        group_key = variant_key
+                    else:
+                        group_key = (batch_index,)
+                    group = batch_groups.setdefault(group_key, {'video': batch_video, 'playlist': batch_playlist, 'members': {}, 'variants': {}})
+                    group['members'][batch_index] = (settings, batch_is_shorts)
+                    group['variants'][variant_key] = (settings, batch_is_shorts)
+                group_of_batch = {batch_index: key for key, group in batch_groups.items() for batch_index in group['members']}
+                
+                # Admission control against benchmarked host capacity; each distinct rendition costs one encode
+                stream_costs = []
+                for group in batch_groups.values():
+                    for settings, batch_is_shorts in group['variants'].values():
+                        use_copy = (len(group['variants']) == 1 and not group['playlist'] and settings.get('copy_mode', 'auto') == 'auto'
+                                    and check_stream_copy_eligibility(group['video'], settings, batch_is_shorts)[0])
+                        stream_costs.append(estimate_stream_cores(settings, use_copy))
+                capacity = plan_batch_capacity(stream_costs, get_engine().host_load()['cores'])
+                # Refusing only skips this start; the rest of the page still renders
+                capacity_refused = False
+                if not capacity['fits']:
+                    capacity_msg = (f"Requested batches need ~{capacity['required_cores']:.1f} cores but only "
+                                    f"{max(capacity['available_cores'], 0):.1f} of {capacity['total_cores']} are available "
+                                    f"at {int(CAPACITY_TARGET_UTILIZATION * 100)}% target utilization")
+                    if capacity_enforcement == "⛔ Refuse":
+                        st.error(f"⛔ {capacity_msg}. Reduce batches or pick cheaper encoder profiles.")
+                        capacity_refused = True
+                    else:
+                        st.warning(f"⚠️ {capacity_msg}. Streams may drop below realtime.")
+                if capacity['unbenchmarked'] and not capacity_refused:
+                    st.info(f"ℹ️ {capacity['unbenchmarked']} stream(s) use settings without a benchmark; assumed {UNBENCHMARKED_STREAM_CORES} core each.")
+                
+                if not capacity_refused:
+                    # Provision broadcasts concurrently; each group starts as soon as all of its broadcasts are settled
+                    success_count = 0
+                    batch_timings = {}
+                    group_results = {key: {} for key in batch_groups}
+                    if 'batch_live_info' not in st.session_state:
+                        st.session_state['batch_live_info'] = {}
+                    with st.spinner(f"Creating {len(batch_jobs)} YouTube Live broadcasts ({PROVISION_CONCURRENCY} at a time)..."):
+                        with ThreadPoolExecutor(max_workers=PROVISION_CONCURRENCY) as executor:
+                            futures = {
+                                executor.submit(provision_batch_broadcast, service, batch_settings, st.session_state['session_id'], batch_index): batch_index
+                                for batch_index, batch_config, batch_settings in batch_jobs
+                            }
+                            for future in as_completed(futures):
+                                batch_index = futures[future]
+                                live_info, elapsed, error = future.result()
+                                batch_timings[batch_index] = {'Batch': batch_index, 'Provisioning (s)': round(elapsed, 1)}
+                            
+                                if live_info:
+                                    st.session_state['batch_live_info'][f"batch_{batch_index}"] = live_info
+                                else:
+                                    st.error(f"❌ Failed to create live broadcast for batch {batch_index}: {error}")
+                                    batch_timings[batch_index]['Status'] = "❌ provisioning failed"
+                            
+                                group_key = group_of_batch[batch_index]
+                                group = batch_groups[group_key]
+                                group_results[group_key][batch_index] = live_info
+                                if len(group_results[group_key]) < len(group['members']):
+                                    continue
+                            
+                                # Start streaming for this group with its specific video and encoder profiles
+                                bound = [(index, info['stream_key']) + group['members'][index]
+                                         for index, info in sorted(group_results[group_key].items()) if info]
+                                if not bound:
+                                    continue
+                                if len(bound) == 1:
+                                    index, stream_key, settings, batch_is_shorts = bound[0]
+                                    started = auto_start_streaming(
+                                        group['video'],
+                                        stream_key,
+                                        is_shorts=batch_is_shorts,
+                                        session_id=st.session_state['session_id'],
+                                        video_settings=settings,
+                                        batch_index=index,
+                                        playlist=group['playlist']
+                                    )
+                                else:
+                                    started = auto_start_shared_streaming(
+                                        group['video'],
+                                        bound,
+                                        session_id=st.session_state['session_id']
+                                    )
+                                for index, *_ in bound:
+                                    if started:
+                                        get_stream_health_poller().watch(st.session_state['session_id'], f"batch_{index}", service,
+                                                                         group_results[group_key][index]['stream_id'])
+                                        success_count += 1
+                                        batch_timings[index]['Status'] = "🟢 live" if len(bound) == 1 else f"🟢 live (shared ×{len(bound)})"
+                                    else:
+                                        st.error(f"❌ Failed to start streaming for batch {index}")
+                                        batch_timings[index]['Status'] = "❌ ffmpeg failed"
+                
+                    if batch_timings:
+                        st.dataframe(sorted(batch_timings.values(), key=lambda t: t['Batch']), hide_index=True)
                     
-                if success_count > 0:
-                    st.success(f"🎉 Started {success_count} batch streams successfully!")
-                else:
-                    st.error("❌ Failed to start any batch streams")
+                    if success_count > 0:
+                        st.success(f"🎉 Started {success_count} batch streams successfully!")
+                    else:
+                        st.error("❌ Failed to start any batch streams")
             
             if st.button("⏹️ Stop Streaming", type="secondary"):
-                st.session_state['streaming'] = False
-                if 'stream_start_time' in st.session_state:
-                    del st.session_state['stream_start_time']
-                os.system("pkill ffmpeg")
+                get_engine().stop_stream(st.session_state['session_id'], ["batch_0"])
                 if os.path.exists("temp_video.mp4"):
                     os.remove("temp_video.mp4")
                 st.warning("⏸️ Streaming stopped!")
@@ -1944,14 +5807,12 @@ def main():
             
             # Stop Batch Streaming Button
             if st.button("⏹️ Stop All Batch Streaming", type="secondary"):
-                if 'ffmpeg_threads' in st.session_state:
-                    for thread in st.session_state['ffmpeg_threads'].values():
-                        if thread.is_alive():
-                            # Note: In practice, you'd want a more graceful shutdown
-                            pass
-                    os.system("pkill ffmpeg")
-                    st.session_state['batch_streams'] = {}
-                    st.session_state['ffmpeg_threads'] = {}
+                if batch_streams:
+                    exit_codes = get_engine().stop_stream(
+                        st.session_state['session_id'],
+                        list(batch_streams.keys())
+                    )
+                    log_to_database(st.session_state['session_id'], "INFO", f"Batch streaming stopped by user, exit codes: {exit_codes}")
                     st.warning("⏹️ All batch streaming stopped!")
                     st.rerun()
             
@@ -1981,12 +5842,57 @@ def main():
             session_logs = get_logs_from_database(st.session_state['session_id'], 50)
             st.metric("Session Logs", len(session_logs))
             
-            if 'live_logs' in st.session_state:
-                st.metric("Live Log Entries", len(st.session_state['live_logs']))
+            # Encoder health per batch from sampled ffmpeg progress
+            latest_metrics = get_latest_stream_metrics(st.session_state['session_id'])
+            if latest_metrics:
+                st.write("**🎛️ Encoder Health**")
+                for batch_index, timestamp, frame, fps, bitrate_kbps, speed, drop_frames, dup_frames, out_time_ms in latest_metrics:
+                    speed_text = f"{speed:.2f}x" if speed is not None else "N/A"
+                    fps_text = f"{fps:.1f}" if fps is not None else "N/A"
+                    st.caption(f"Batch {batch_index}: speed {speed_text} · fps {fps_text} · dropped {drop_frames or 0} · dup {dup_frames or 0}")
+                    if speed is not None and speed < 0.95:
+                        st.warning(f"⚠️ Batch {batch_index} is encoding slower than realtime ({speed_text})")
+            
+            # YouTube's view of each ingest stream, read from the shared poller's cache
+            stream_health = get_stream_health_poller().health(st.session_state['session_id'])
+            if stream_health:
+                st.write("**📡 YouTube Stream Health**")
+                for batch_key, health in sorted(stream_health.items()):
+                    batch_index = batch_key.replace('batch_', '')
+                    health_icon = {"good": "🟢", "ok": "🟡", "bad": "🔴", "noData": "⚫"}.get(health['health_status'], "⚪")
+                    st.caption(f"{health_icon} Batch {batch_index}: {health['stream_status']} · health {health['health_status'] or 'N/A'}"
+                               f" · checked {health['checked_at'][11:19]}")
+                    for issue in health['issues']:
+                        st.warning(f"⚠️ Batch {batch_index}: {issue}")
+                    if health['restarted_at']:
+                        st.caption(f"🔁 Batch {batch_index}: restarted for missing data at {health['restarted_at'][11:19]}")
+            
+            # Automatic reconnects per batch
+            restart_summary = get_restart_summary(st.session_state['session_id'])
+            for batch_index, restart_count, downtime_seconds in restart_summary:
+                st.caption(f"🔁 Batch {batch_index}: {restart_count} restarts, {timedelta(seconds=int(downtime_seconds))} downtime")
+            
+            # Pre-transcode cache usage
+            cache_stats = get_transcode_cache().stats()
+            st.metric("Transcode Cache", f"{cache_stats['entries']} files / {cache_stats['size_bytes'] / 1024 ** 3:.1f} GB",
+                      delta=f"{cache_stats['pending']} building" if cache_stats['pending'] else None)
+            
+            # Background log writer health
+            log_stats = get_log_writer().stats()
+            st.metric("Log Rows Written", log_stats['written'])
+            if log_stats['dropped']:
+                st.warning(f"⚠️ {log_stats['dropped']} log rows dropped (log writer queue full)")
+            pruner = get_log_pruner()
+            if pruner.last_error:
+                st.warning(f"⚠️ Log retention pass failed: {pruner.last_error}")
+            elif pruner.last_run:
+                st.caption(f"🧹 Retention: {pruner.deleted} expired rows pruned, last pass {pruner.last_run.strftime('%H:%M:%S')}")
+            
+            if single_stream:
+                st.metric("Live Log Entries", single_stream['log_count'])
             
             # Batch statistics
-            if 'batch_streams' in st.session_state:
-                active_batches = sum(1 for batch in st.session_state['batch_streams'].values() if batch.get('streaming', False))
+            if batch_streams:
                 st.metric("Active Batches", active_batches)
             
             # Channel info display
@@ -2016,8 +5922,8 @@ def main():
             )
 
             if duration_option == "⏱️ Custom Waktu":
-                custom_duration_hours = st.number_input("Jam", min_value=0, max_value=24, value=1, step=1)
-                custom_duration_minutes = st.number_input("Menit", min_value=0, max_value=59, value=0, step=5)
+                custom_duration_hours = st.number_input("Jam", min_value=0, max_value=24, value=1, step=1, key="custom_duration_hours")
+                custom_duration_minutes = st.number_input("Menit", min_value=0, max_value=59, value=0, step=5, key="custom_duration_minutes")
                 total_custom_seconds = custom_duration_hours * 3600 + custom_duration_minutes * 60
             elif duration_option == "🎬 Ikuti Panjang Video":
                 st.info("Fitur ini membutuhkan deteksi durasi video menggunakan `ffprobe`. Pastikan sudah terinstal.")
@@ -2030,6 +5936,75 @@ def main():
                 if video_duration:
                     st.info(f"⏰ Streaming akan berhenti otomatis setelah {timedelta(seconds=int(video_duration))}")
     
+    # Scheduled broadcasts, persisted and run by the background scheduler
+    st.markdown("---")
+    st.header("🗓️ Scheduled Broadcasts")
+    if not ENGINE_URL:
+        st.caption("ℹ️ Jobs run while this app is loaded; after a server restart they wait for the page to be opened. Use a standalone engine (STREAM_ENGINE_URL) for unattended schedules.")
+    with st.expander("➕ Schedule a Broadcast"):
+        saved_channel_names = [channel['name'] for channel in load_saved_channels()]
+        col_sched1, col_sched2 = st.columns(2)
+        with col_sched1:
+            sched_name = st.text_input("Job name", value="Scheduled stream", key="sched_name")
+            sched_channel = st.selectbox("Channel", saved_channel_names or ["No saved channels"], key="sched_channel")
+            sched_video = st.selectbox("Video", get_media_library().videos() or ["No videos available"], key="sched_video", format_func=media_label)
+            sched_title = st.text_input("Broadcast title", value="Scheduled Live Stream", key="sched_title")
+            sched_description = st.text_area("Broadcast description", value="", key="sched_description", height=68)
+            sched_privacy = st.selectbox("Privacy", ["public", "unlisted", "private"], key="sched_privacy")
+        with col_sched2:
+            pytz = import_optional("pytz", "pytz")
+            sched_timezone = st.selectbox("Timezone", pytz.common_timezones,
+                                          index=pytz.common_timezones.index("Asia/Jakarta"), key="sched_timezone")
+            sched_repeat = st.radio("Repeat", ["One-shot", "Cron"], horizontal=True, key="sched_repeat")
+            if sched_repeat == "Cron":
+                sched_cron = st.text_input("Cron (minute hour day month weekday)", value="0 20 * * *", key="sched_cron")
+            else:
+                sched_cron = None
+                sched_date = st.date_input("Start date", key="sched_date")
+                sched_time = st.time_input("Start time", key="sched_time")
+            sched_hours = st.number_input("Duration hours (0 = until stopped)", min_value=0, max_value=240, value=1, key="sched_hours")
+            sched_minutes = st.number_input("Duration minutes", min_value=0, max_value=59, value=0, key="sched_minutes")
+        
+        if st.button("🗓️ Schedule"):
+            if not saved_channel_names or not get_media_library().videos():
+                st.error("❌ A saved channel and a video are required")
+            else:
+                job_id = add_scheduled_job(
+                    sched_name,
+                    sched_channel,
+                    {
+                        'video': sched_video,
+                        'title': sched_title,
+                        'description': sched_description,
+                        'privacy': sched_privacy,
+                        'video_settings': st.session_state.get('video_settings')
+                    },
+                    sched_timezone,
+                    start_local=None if sched_cron else datetime.combine(sched_date, sched_time),
+                    duration_seconds=(sched_hours * 3600 + sched_minutes * 60) or None,
+                    cron=sched_cron
+                )
+                if job_id:
+                    st.success(f"✅ Scheduled job #{job_id}")
+    
+    scheduled_jobs = load_scheduled_jobs()
+    if scheduled_jobs:
+        for job in scheduled_jobs:
+            col_job1, col_job2 = st.columns([4, 1])
+            with col_job1:
+                next_local = utc_to_local(datetime.fromisoformat(job['next_run_utc']), job['timezone'])
+                repeat = f"cron `{job['cron']}`" if job['cron'] else "one-shot"
+                duration = timedelta(seconds=job['duration_seconds']) if job['duration_seconds'] else "until stopped"
+                st.write(f"**#{job['id']} {job['name']}** · {job['status']} · {next_local.strftime('%Y-%m-%d %H:%M')} {job['timezone']} · {duration} · {repeat}")
+                if job['last_error']:
+                    st.caption(f"⚠️ {job['last_error']}")
+            with col_job2:
+                if job['status'] in SCHEDULER_ACTIVE_STATUSES and st.button("✖️ Cancel", key=f"cancel_job_{job['id']}"):
+                    cancel_scheduled_job(job['id'])
+                    st.rerun()
+    else:
+        st.info("No scheduled broadcasts.")
+    
     # Live Logs Section
     st.markdown("---")
     st.header("📝 Live Streaming Logs")
@@ -2040,33 +6015,9 @@ def main():
     with tab1:
         st.subheader("Real-time Streaming Logs")
         
-        # Live logs container
-        log_container = st.container()
-        with log_container:
-            if 'live_logs' in st.session_state and st.session_state['live_logs']:
-                # Show last 50 live logs
-                recent_logs = st.session_state['live_logs'][-50:]
-                logs_text = "\n".join(recent_logs)
-                st.text_area("Live Logs", logs_text, height=300, disabled=True, key="live_logs_display")
-            else:
-                st.info("No live logs available. Start streaming to see real-time logs.")
-        
-        # Batch logs if available
-        if 'batch_streams' in st.session_state:
-            for batch_key, batch_data in st.session_state['batch_streams'].items():
-                if batch_data.get('streaming', False) and 'live_logs' in batch_data:
-                    batch_index = batch_key.replace('batch_', '')
-                    with st.expander(f"🔄 Batch {batch_index} Logs"):
-                        recent_batch_logs = batch_data['live_logs'][-20:]  # Last 20 logs per batch
-                        batch_logs_text = "\n".join(recent_batch_logs)
-                        st.text_area(f"Batch {batch_index} Logs", batch_logs_text, height=150, disabled=True, key=f"batch_{batch_index}_logs")
-        
-        # Auto-refresh toggle
-        auto_refresh = st.checkbox("🔄 Auto-refresh logs", value=streaming)
-        
-        if auto_refresh and (streaming or ('batch_streams' in st.session_state and any(b.get('streaming', False) for b in st.session_state['batch_streams'].values()))):
-            time.sleep(2)
-            st.rerun()
+        # Auto-refresh toggle; only the log fragment reruns, not the whole page
+        auto_refresh = st.checkbox("🔄 Auto-refresh logs", value=streaming or active_batches > 0)
+        st.fragment(render_live_logs, run_every=LIVE_LOG_REFRESH_SECONDS if auto_refresh else None)(st.session_state['session_id'])
     
     with tab2:
         st.subheader("Current Session History")
@@ -2092,36 +6043,119 @@ def main():
     with tab3:
         st.subheader("All Historical Logs")
         
-        # Filter options
-        col_filter1, col_filter2 = st.columns(2)
+        # Filter options, all applied in SQL
+        col_filter1, col_filter2, col_filter3 = st.columns(3)
         
         with col_filter1:
-            log_limit = st.selectbox("Show logs", [50, 100, 200, 500], index=1)
+            log_limit = st.selectbox("Logs per page", [50, 100, 200, 500], index=1)
+            log_type_filter = st.multiselect("Filter by type", ["INFO", "ERROR", "FFMPEG"])
         
         with col_filter2:
-            log_type_filter = st.selectbox("Filter by type", ["All", "INFO", "ERROR", "FFMPEG"])
+            log_session_filter = st.text_input("Session ID", placeholder="All sessions")
+            log_channel_filter = st.selectbox("Channel", ["All"] + get_log_channels())
+        
+        with col_filter3:
+            log_date_range = st.date_input("Date range", value=(), help="Leave empty for all dates")
+            log_text_filter = st.text_input("🔍 Search messages", placeholder="e.g. Connection refused")
+        
+        log_filters = {
+            'session_id': log_session_filter.strip() or None,
+            'log_types': log_type_filter or None,
+            'channel_name': None if log_channel_filter == "All" else log_channel_filter,
+            'since': log_date_range[0].isoformat() if len(log_date_range) > 0 else None,
+            'until': (log_date_range[-1] + timedelta(days=1)).isoformat() if len(log_date_range) > 0 else None,
+            'text': log_text_filter.strip() or None
+        }
         
-        all_logs = get_logs_from_database(limit=log_limit)
+        # Start from the newest page whenever the filters change
+        filter_signature = json.dumps([log_filters, log_limit], sort_keys=True)
+        if st.session_state.get('log_filter_signature') != filter_signature:
+            st.session_state['log_filter_signature'] = filter_signature
+            st.session_state['log_page_cursors'] = [None]
+        page_cursors = st.session_state['log_page_cursors']
+        
+        all_logs, next_cursor = query_logs(**log_filters, cursor=page_cursors[-1], limit=log_limit)
         
         if all_logs:
-            # Filter by type if selected
-            if log_type_filter != "All":
-                all_logs = [log for log in all_logs if log[1] == log_type_filter]
-            
             # Display in expandable sections
-            for i, log in enumerate(all_logs[:50]):  # Limit display to 50 for performance
-                timestamp, log_type, message, video_file, channel_name = log
+            for log in all_logs:
+                log_id, timestamp, log_type, message, video_file, channel_name, log_session = log
                 
                 with st.expander(f"{log_type} - {timestamp} - {message[:50]}..."):
                     st.write(f"**Timestamp:** {timestamp}")
                     st.write(f"**Type:** {log_type}")
                     st.write(f"**Message:** {message}")
+                    st.write(f"**Session:** {log_session}")
                     if video_file:
                         st.write(f"**Video File:** {video_file}")
                     if channel_name:
                         st.write(f"**Channel:** {channel_name}")
         else:
             st.info("No historical logs available.")
+        
+        col_page1, col_page2, col_page3 = st.columns([1, 2, 1])
+        with col_page1:
+            if len(page_cursors) > 1 and st.button("◀ Newer"):
+                page_cursors.pop()
+                st.rerun()
+        with col_page2:
+            st.caption(f"Page {len(page_cursors)}")
+        with col_page3:
+            if next_cursor and st.button("Older ▶"):
+                page_cursors.append(list(next_cursor))
+                st.rerun()
+
+# Cold start target: from the first line of the script to main()
+STARTUP_BUDGET_SECONDS = 1.5
+
+@st.cache_resource(show_spinner=False)
+def startup_report():
+    """Time from interpreter start of this script to main() on the first (cold) run only"""
+    return {'seconds': time.perf_counter() - _SCRIPT_STARTED, 'measured_at': datetime.now()}
+
+def profile_imports(top=15):
+    """Top-level import costs of this module, measured in a fresh interpreter with -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {Path(__file__).stem}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)", line)
+        if match:
+            entries.append((len(match.group(3)), match.group(4), int(match.group(1)), int(match.group(2))))
+    if not entries:
+        return []
+    top_level = min(depth for depth, *_ in entries)
+    rows = [
+        {'Module': name, 'Self (ms)': round(self_us / 1000, 1), 'Cumulative (ms)': round(cumulative_us / 1000, 1)}
+        for depth, name, self_us, cumulative_us in entries if depth == top_level
+    ]
+    return sorted(rows, key=lambda row: row['Cumulative (ms)'], reverse=True)[:top]
+
+def parse_cli_args(argv):
+    """Command line: no subcommand runs the Streamlit UI, `engine` runs the standalone engine, `run` runs batches headless"""
+    parser = argparse.ArgumentParser(description="Advanced YouTube Live Streaming")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    engine_parser = subparsers.add_parser("engine", help="Run the streaming engine as a standalone localhost service")
+    engine_parser.add_argument("--host", default=ENGINE_HOST)
+    engine_parser.add_argument("--port", type=int, default=ENGINE_PORT)
+    
+    run_parser = subparsers.add_parser("run", help="Provision and stream the batches of a JSON config without the web UI")
+    run_parser.add_argument("--config", required=True, help="Channel config JSON with a 'batches' list")
+    run_parser.add_argument("--session", help="Session ID for logs (default: headless_<timestamp>)")
+    
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
-    main()
+    args = parse_cli_args(sys.argv[1:])
+    if args.command == "engine":
+        serve_engine(args.host, args.port)
+    elif args.command == "run":
+        sys.exit(run_headless(args.config, args.session))
+    else:
+        main()